@@ -0,0 +1,87 @@
+import numpy as np
+
+
+ALLOCATION_POLICIES = ("proportional", "near_first", "equal_risk")
+
+
+class MarginAllocation:
+    # Результат распределения маржи по уровням сетки: объемы после урезания и отчет
+    __slots__ = (
+        "policy",
+        "budget",
+        "requested_volumes",
+        "volumes",
+        "requested_margin",
+        "allocated_margin",
+    )
+
+    def __init__(self, policy, budget, requested_volumes, volumes, requested_margin, allocated_margin):
+        self.policy = policy
+        self.budget = budget
+        self.requested_volumes = requested_volumes
+        self.volumes = volumes
+        self.requested_margin = requested_margin
+        self.allocated_margin = allocated_margin
+
+    @property
+    def trimmed(self):
+        return self.requested_margin > self.allocated_margin
+
+    def report(self):
+        requested = float(self.requested_margin.sum())
+        allocated = float(self.allocated_margin.sum())
+        return {
+            "policy": self.policy,
+            "budget": self.budget,
+            "levels": len(self.volumes),
+            "requested_margin": requested,
+            "allocated_margin": allocated,
+            "trimmed_margin": requested - allocated,
+            "trimmed_volume": float((self.requested_volumes - self.volumes).sum()),
+            "trimmed_levels": int(np.count_nonzero(self.trimmed)),
+            "dropped_levels": int(np.count_nonzero(self.volumes <= 0)),
+        }
+
+
+def allocate_margin(prices, volumes, distances, budget, commission_rate=0.0, policy="proportional"):
+    # Одна проверка маржи на всю сетку. Стоимость уровня - цена * объем плюс комиссия.
+    #   proportional - все объемы умножаются на один коэффициент
+    #   near_first   - уровни ближе к цене (distances) получают полный объем первыми
+    #   equal_risk   - water-filling: маржа уровня ограничена общим потолком,
+    #                  мелкие уровни проходят целиком, крупные урезаются до потолка
+    if policy not in ALLOCATION_POLICIES:
+        raise ValueError(f"Unknown allocation policy: {policy}")
+    prices = np.asarray(prices, dtype=float)
+    requested_volumes = np.asarray(volumes, dtype=float)
+    unit_cost = prices * (1 + commission_rate)
+    requested = unit_cost * requested_volumes
+    budget = max(float(budget), 0.0)
+    total = requested.sum()
+
+    if total <= budget:
+        allocated = requested.copy()
+    elif policy == "proportional":
+        allocated = requested * (budget / total)
+    elif policy == "near_first":
+        order = np.argsort(np.asarray(distances, dtype=float), kind="stable")
+        spent_before = np.cumsum(requested[order]) - requested[order]
+        allocated = np.empty_like(requested)
+        allocated[order] = np.clip(budget - spent_before, 0.0, requested[order])
+    else:  # equal_risk
+        sorted_margin = np.sort(requested)
+        count = len(sorted_margin)
+        spent_before = np.cumsum(sorted_margin) - sorted_margin
+        # Маржа, если потолок поставить на уровне k-го по величине запроса
+        filled = spent_before + sorted_margin * (count - np.arange(count))
+        k = int(np.searchsorted(filled, budget))
+        ceiling = (budget - spent_before[k]) / (count - k)
+        allocated = np.minimum(requested, ceiling)
+
+    # Неурезанные уровни сохраняют запрошенный объем без ошибки округления
+    with np.errstate(divide="ignore", invalid="ignore"):
+        allocated_volumes = np.where(
+            allocated >= requested,
+            requested_volumes,
+            np.where(unit_cost > 0, allocated / unit_cost, 0.0),
+        )
+    return MarginAllocation(policy, budget, requested_volumes, allocated_volumes, requested, allocated)
@@ -0,0 +1,88 @@
+import numpy as np
+
+
+class Bar:
+    def __init__(self, start, open_price):
+        self.start = start
+        self.end = start
+        self.open = open_price
+        self.high = open_price
+        self.low = open_price
+        self.close = open_price
+        self.ticks = 1
+
+    def update(self, price, time):
+        self.end = time
+        self.close = price
+        if price > self.high:
+            self.high = price
+        elif price < self.low:
+            self.low = price
+        self.ticks += 1
+
+    def intrabar_path(self):
+        return intrabar_path(self.open, self.high, self.low, self.close)
+
+
+def intrabar_path(open_price, high, low, close):
+    # Детерминированное допущение о ходе цены внутри бара:
+    # растущий бар сначала ходит к минимуму, падающий - к максимуму
+    if close >= open_price:
+        return (open_price, low, high, close)
+    return (open_price, high, low, close)
+
+
+class OHLCAggregator:
+    # Инкрементальная сборка баров из тиков.
+    # timeframe - число тиков в баре, либо длительность в секундах при by_time=True
+    def __init__(self, timeframe, by_time=False):
+        if timeframe <= 0:
+            raise ValueError("timeframe must be positive")
+        self.timeframe = timeframe
+        self.by_time = by_time
+        self.current = None
+        self.tick_count = 0
+
+    def _bucket(self, time):
+        if self.by_time:
+            return int(time // self.timeframe)
+        return self.tick_count // self.timeframe
+
+    def add_tick(self, price, time=None):
+        if time is None:
+            time = self.tick_count
+        bucket = self._bucket(time)
+        self.tick_count += 1
+
+        if self.current is None:
+            self.current = Bar(time, price)
+            self.current_bucket = bucket
+            return None
+        if bucket == self.current_bucket:
+            self.current.update(price, time)
+            return None
+
+        # Тик открыл новый бар - отдаем завершенный
+        completed = self.current
+        self.current = Bar(time, price)
+        self.current_bucket = bucket
+        return completed
+
+    def flush(self):
+        completed = self.current
+        self.current = None
+        return completed
+
+
+def aggregate_ticks(prices, timeframe):
+    # Векторная сборка баров по числу тиков; неполный последний бар тоже возвращается
+    prices = np.asarray(prices, dtype=float)
+    if len(prices) == 0:
+        empty = np.empty(0)
+        return empty, empty, empty, empty
+    starts = np.arange(0, len(prices), timeframe)
+    opens = prices[starts]
+    highs = np.maximum.reduceat(prices, starts)
+    lows = np.minimum.reduceat(prices, starts)
+    closes = prices[np.minimum(starts + timeframe, len(prices)) - 1]
+    return opens, highs, lows, closes
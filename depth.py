@@ -0,0 +1,196 @@
+import numpy as np
+
+
+def align_levels(rows, origins, target):
+    # Строки с разным началом диапазона (в уровнях) переводятся к началу target;
+    # уровни, выходящие за края, отбрасываются. Строки идут по времени, поэтому
+    # одинаковые origins образуют непрерывные участки и копируются срезами
+    if np.all(origins == target):
+        return rows
+    aligned = np.zeros_like(rows)
+    num_levels = rows.shape[1]
+    bounds = np.concatenate(([0], np.flatnonzero(np.diff(origins)) + 1, [len(origins)]))
+    for start, end in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+        offset = int(origins[start] - target)
+        if abs(offset) >= num_levels:
+            continue
+        if offset >= 0:
+            aligned[start:end, offset:] = rows[start:end, : num_levels - offset]
+        else:
+            aligned[start:end, : num_levels + offset] = rows[start:end, -offset:]
+    return aligned
+
+
+class DepthBuffer:
+    # Кольцевой буфер "время x цена" с объемом стоящих ордеров сетки.
+    # Покупки пишутся положительным объемом, продажи - отрицательным.
+    def __init__(
+        self, price_min, price_max, num_levels=200, capacity=200000, recenter=True, coarse_factor=16
+    ):
+        if price_max <= price_min:
+            raise ValueError("price_max must be greater than price_min")
+        self.base_price_min = float(price_min)
+        self.num_levels = int(num_levels)
+        self.capacity = int(capacity)
+        self.level_size = (float(price_max) - self.base_price_min) / self.num_levels
+        # Память выделяется один раз, дальше строки только перезаписываются
+        self.data = np.zeros((self.capacity, self.num_levels), dtype=np.float32)
+        self.ticks = np.full(self.capacity, -1, dtype=np.int64)
+        self.count = 0
+        self._row = np.zeros(self.num_levels, dtype=np.float32)
+        # Сетка дрейфует вместе с ценой: диапазон сдвигается на целое число уровней.
+        # Каждая строка помнит свое начало (origin), поэтому сдвиг не трогает записанное;
+        # объем, который все равно не помещается, учитывается отдельно
+        self.recenter = recenter
+        self.origin = 0
+        self.origins = np.zeros(self.capacity, dtype=np.int64)
+        self.recenter_count = 0
+        self.dropped_volume = 0.0
+        self.dropped_orders = 0
+        # Грубый уровень: суммы блоков по coarse_factor строк для отдаленного просмотра
+        self.coarse_factor = int(coarse_factor)
+        self.coarse_capacity = self.capacity // self.coarse_factor + 2
+        self.coarse = np.zeros((self.coarse_capacity, self.num_levels), dtype=np.float32)
+        self.coarse_origins = np.zeros(self.coarse_capacity, dtype=np.int64)
+
+    @classmethod
+    def around(cls, price, range_percent=20.0, num_levels=200, capacity=200000):
+        # Начальный диапазон вокруг цены; дальше он сдвигается вслед за сеткой
+        half_range = price * range_percent / 100
+        return cls(price - half_range, price + half_range, num_levels=num_levels, capacity=capacity)
+
+    @property
+    def price_min(self):
+        return self.base_price_min + self.origin * self.level_size
+
+    @property
+    def price_max(self):
+        return self.price_min + self.num_levels * self.level_size
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def clear(self):
+        self.ticks.fill(-1)
+        self.count = 0
+        self._row.fill(0)
+        self.origin = 0
+        self.origins.fill(0)
+        self.recenter_count = 0
+        self.dropped_volume = 0.0
+        self.dropped_orders = 0
+        self.coarse.fill(0)
+        self.coarse_origins.fill(0)
+
+    def price_to_level(self, prices):
+        return np.floor(
+            (np.asarray(prices, dtype=float) - self.price_min) / self.level_size
+        ).astype(np.intp)
+
+    def rebuild_row(self, orders):
+        self._row.fill(0)
+        resting = [order for order in orders if not order.executed]
+        if not resting:
+            return
+        prices = np.fromiter((order.price for order in resting), float, len(resting))
+        volumes = np.fromiter(
+            (order.volume if order.order_type == "buy" else -order.volume for order in resting),
+            float,
+            len(resting),
+        )
+        levels = self.price_to_level(prices)
+        if self.recenter and (levels.min() < 0 or levels.max() >= self.num_levels):
+            levels -= self.shift_range(levels.min(), levels.max())
+        inside = (levels >= 0) & (levels < self.num_levels)
+        if not inside.all():
+            self.dropped_orders += int(np.count_nonzero(~inside))
+            self.dropped_volume += float(np.abs(volumes[~inside]).sum())
+        np.add.at(self._row, levels[inside], volumes[inside])
+
+    def shift_range(self, low_level, high_level):
+        # Центрируем диапазон на текущих ордерах
+        shift = int((low_level + high_level + 1) // 2 - self.num_levels // 2)
+        if shift:
+            self.origin += shift
+            self.recenter_count += 1
+        return shift
+
+    def record(self, tick, orders=None, changed=True):
+        # Строка пересчитывается только если стакан изменился, иначе копируется прошлая
+        if changed and orders is not None:
+            self.rebuild_row(orders)
+        index = self.count % self.capacity
+        self.data[index] = self._row
+        self.ticks[index] = tick
+        self.origins[index] = self.origin
+
+        block = (self.count // self.coarse_factor) % self.coarse_capacity
+        if self.count % self.coarse_factor == 0:
+            self.coarse[block] = self._row
+            self.coarse_origins[block] = self.origin
+        elif self.coarse_origins[block] == self.origin:
+            self.coarse[block] += self._row
+        else:
+            # Диапазон сдвинулся внутри блока - строка приводится к началу блока
+            self.coarse[block] += align_levels(
+                self._row[None, :], np.array([self.origin]), self.coarse_origins[block]
+            )[0]
+        self.count += 1
+
+    def _chronological_index(self):
+        size = len(self)
+        start = self.count - size
+        return (start + np.arange(size)) % self.capacity
+
+    def _image(self, image, tick_start, tick_end):
+        return {
+            "image": image,
+            "tick_start": tick_start,
+            "tick_end": tick_end,
+            "price_min": self.price_min,
+            "price_max": self.price_max,
+            "dropped_volume": self.dropped_volume,
+        }
+
+    def _coarse_image(self, lo, hi, factor):
+        # Только целые блоки грубого уровня, строки которых еще есть в кольце
+        first = self.count - len(self)
+        group = factor // self.coarse_factor
+        first_block = -(-(first + lo) // self.coarse_factor)
+        end_block = min(first + hi, self.count) // self.coarse_factor
+        num_blocks = (end_block - first_block) // group * group
+        if num_blocks <= 0:
+            return None
+        blocks = (first_block + np.arange(num_blocks)) % self.coarse_capacity
+        rows = align_levels(self.coarse[blocks], self.coarse_origins[blocks], self.origin)
+        step = group * self.coarse_factor
+        image = rows.reshape(-1, group, self.num_levels).sum(axis=1) / step
+        start_row = first_block * self.coarse_factor
+        end_row = start_row + num_blocks * self.coarse_factor - 1
+        return self._image(
+            image,
+            int(self.ticks[start_row % self.capacity]),
+            int(self.ticks[end_row % self.capacity]) + 1,
+        )
+
+    def get_image(self, start_tick=None, end_tick=None, max_columns=2000):
+        if self.count == 0:
+            return None
+
+        index = self._chronological_index()
+        ticks = self.ticks[index]
+        lo = 0 if start_tick is None else np.searchsorted(ticks, start_tick, side="left")
+        hi = len(ticks) if end_tick is None else np.searchsorted(ticks, end_tick, side="right")
+        if hi <= lo:
+            return None
+
+        # Прореживание при отдалении: усредняем соседние тики по блокам,
+        # крупные блоки берутся из грубого уровня без обхода всего кольца
+        factor = max(1, int(np.ceil((hi - lo) / max(1, max_columns))))
+        if factor >= self.coarse_factor:
+            return self._coarse_image(lo, hi, factor)
+        usable = ((hi - lo) // factor) * factor
+        index = index[lo : lo + usable]
+        rows = align_levels(self.data[index], self.origins[index], self.origin)
+        image = rows.reshape(-1, factor, self.num_levels).mean(axis=1)
+        return self._image(image, int(ticks[lo]), int(ticks[lo + usable - 1]) + 1)
@@ -0,0 +1,506 @@
+import time
+
+import numpy as np
+
+from bars import aggregate_ticks
+from orders import OrderManager
+
+
+class SimulationEngine:
+    # Безголовый движок: генерирует цены, считает EMA и прогоняет OrderManager.
+    # Не зависит от Qt/pyqtgraph, график подключается опционально через graph.
+    def __init__(
+        self,
+        initial_price=100.0,
+        volatility=0.001,
+        initial_balance=10000.0,
+        commission_rate=0.00016,
+        grid_size=10,
+        grid_step_percent=0.8,
+        ema_period=100,
+        seed=None,
+        graph=None,
+        **manager_options,
+    ):
+        self.initial_price = initial_price
+        self.volatility = volatility
+        self.ema_period = ema_period
+        self.ema_alpha = 2 / (ema_period + 1)
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.order_manager = OrderManager(
+            initial_balance,
+            commission_rate,
+            grid_size,
+            graph,
+            grid_step_percent=grid_step_percent,
+            **manager_options,
+        )
+        self.tick = -1
+        # В режиме баров шаг движка - бар, поэтому исходные тики считаются отдельно
+        self.source_ticks = 0
+        self.bars = 0
+        self.last_price = initial_price
+        self.risk_worker = None
+        self.last_risk = None
+        self.recorder = None
+        self.journal = None
+        self.publisher = None
+
+    def attach_depth_buffer(self, price_range_percent=20.0, num_levels=200, capacity=200000):
+        from depth import DepthBuffer
+
+        om = self.order_manager
+        om.depth_buffer = DepthBuffer.around(
+            self.last_price, price_range_percent, num_levels=num_levels, capacity=capacity
+        )
+        om.book_changed = True
+        if hasattr(om.graph, "set_depth_buffer"):
+            om.graph.set_depth_buffer(om.depth_buffer)
+        return om.depth_buffer
+
+    def attach_timeline(self, keyframe_interval=10000):
+        from timeline import Timeline
+
+        om = self.order_manager
+        timeline = Timeline(keyframe_interval, om.initial_balance, om.commission_rate)
+        om.event_listeners.append(timeline)
+        graph = om.graph
+        if hasattr(graph, "set_timeline"):
+            graph.set_timeline(timeline)
+        return timeline
+
+    def attach_ledger(self, level_size=0.01):
+        from ledger import TradeLedger
+
+        om = self.order_manager
+        om.ledger = TradeLedger(level_size, om.instrument)
+        return om.ledger
+
+    def attach_journal(self, path, buffer_records=8192):
+        from journal import JournalWriter
+
+        self.journal = JournalWriter(path, buffer_records)
+        self.order_manager.event_listeners.append(self.journal)
+        return self.journal
+
+    def attach_publisher(self, name=None, interval=1000, tail=1000, unlink=False):
+        from publisher import StatePublisher
+
+        self.publisher = StatePublisher(name, interval=interval, tail=tail, unlink=unlink)
+        return self.publisher
+
+    def attach_recorder(self, frame_stride=1000):
+        from render import RunRecorder
+
+        self.recorder = RunRecorder(frame_stride)
+        return self.recorder
+
+    def attach_risk_worker(self, interval=1000, num_paths=2000, horizon=500, seed=None):
+        from risk import RiskWorker
+
+        self.risk_worker = RiskWorker(
+            interval=interval, num_paths=num_paths, horizon=horizon, seed=seed
+        )
+        return self.risk_worker
+
+    def update_risk(self):
+        result = self.risk_worker.update(self.order_manager, self.tick)
+        if result is not None:
+            self.last_risk = result
+            graph = self.order_manager.graph
+            if hasattr(graph, "update_risk_overlay"):
+                graph.update_risk_overlay(result)
+
+    def close(self):
+        if self.risk_worker is not None:
+            self.risk_worker.shutdown()
+            self.last_risk = self.risk_worker.latest
+        if self.journal is not None:
+            self.journal.close()
+        if self.publisher is not None:
+            # Финальное состояние остается видно уже подключенным просмотрщикам
+            self.publisher.publish(self.order_manager, self.tick)
+            self.publisher.close()
+
+    def generate_prices(self, num_ticks, start_price=None):
+        # Геометрическое случайное блуждание, считается векторно целым блоком
+        start = self.last_price if start_price is None else start_price
+        returns = self.rng.normal(0.0, self.volatility, num_ticks)
+        prices = start * np.exp(np.cumsum(returns))
+        instrument = self.order_manager.instrument
+        if instrument is not None:
+            # В целочисленном режиме цены сразу ложатся на сетку тиков
+            prices = instrument.round_prices(prices)
+        return prices
+
+    def update_ema(self, price):
+        om = self.order_manager
+        if om.current_ema is None:
+            om.current_ema = price
+        else:
+            om.current_ema += self.ema_alpha * (price - om.current_ema)
+        return om.current_ema
+
+    def update_extremes(self, price):
+        # Минимум и максимум истории ведутся по ходу, без прохода по price_history
+        om = self.order_manager
+        if om.price_extremes is None:
+            om.price_extremes = (min(om.price_history), max(om.price_history))
+            return
+        low, high = om.price_extremes
+        if price < low:
+            om.price_extremes = (price, high)
+        elif price > high:
+            om.price_extremes = (low, price)
+
+    def step(self, price):
+        price = float(price)
+        self.tick += 1
+        self.source_ticks += 1
+        self.last_price = price
+        self.order_manager.price_history.append(price)
+        self.update_extremes(price)
+        self.update_ema(price)
+        self.order_manager.check_orders(price)
+        if self.recorder is not None:
+            self.recorder.record(self.order_manager, self.tick)
+        if self.publisher is not None:
+            self.publisher.update(self.order_manager, self.tick)
+        if self.risk_worker is not None and self.tick >= self.risk_worker.next_poll_tick:
+            self.update_risk()
+
+    def run_prices(self, prices):
+        for price in prices:
+            self.step(price)
+
+    def step_batch(self, prices):
+        # Стратегия вызывается один раз на пачку. Тики, диапазон которых не задевает
+        # ни одного стоящего ордера, не проходят через process_fills: история, EMA и
+        # распределение обновляются блоком, P&L и маржа считаются на исполнениях и в конце пачки
+        om = self.order_manager
+        prices = np.asarray(prices, dtype=float)
+        if not len(prices):
+            return
+        first_tick = self.tick + 1
+        last = len(prices) - 1
+        if self.recorder is not None or self.publisher is not None:
+            # Записи по тикам требуют состояния счета на каждом тике
+            for index, price in enumerate(prices.tolist()):
+                self.advance(price)
+                om.process_fills(price)
+                if index == last:
+                    self.apply_batch_intents(prices, first_tick)
+                om.record_depth()
+                if self.recorder is not None:
+                    self.recorder.record(om, self.tick)
+                if self.publisher is not None:
+                    self.publisher.update(om, self.tick)
+        else:
+            previous = np.empty_like(prices)
+            previous[0] = om.price_history[-1] if om.price_history else prices[0]
+            previous[1:] = prices[:-1]
+            lows = np.minimum(previous, prices)
+            highs = np.maximum(previous, prices)
+            start = 0
+            filled_last = False
+            while start <= last:
+                crossing = start + om.first_crossing(lows[start:], highs[start:])
+                if crossing > start:
+                    self.advance_quiet(prices[start:crossing], record_last=crossing <= last)
+                if crossing > last:
+                    break
+                price = float(prices[crossing])
+                self.advance(price)
+                om.process_fills(price)
+                filled_last = crossing == last
+                if not filled_last:
+                    om.record_depth()
+                start = crossing + 1
+            if not filled_last:
+                om.current_price = self.last_price
+                om.calculate_floating_profit(self.last_price)
+                om.calculate_free_margin()
+            self.apply_batch_intents(prices, first_tick)
+            om.record_depth()
+        if self.risk_worker is not None and self.tick >= self.risk_worker.next_poll_tick:
+            self.update_risk()
+
+    def advance(self, price):
+        self.tick += 1
+        self.source_ticks += 1
+        self.last_price = price
+        self.order_manager.price_history.append(price)
+        self.update_extremes(price)
+        self.update_ema(price)
+
+    def advance_quiet(self, prices, record_last=True):
+        # Тики без исполнений одним блоком; строка стакана последнего тика пачки
+        # пишется после решений стратегии
+        om = self.order_manager
+        first_tick = self.tick + 1
+        values = prices.tolist()
+        self.tick += len(values)
+        self.source_ticks += len(values)
+        self.last_price = values[-1]
+        om.price_history.extend(values)
+        self.update_extremes(float(prices.min()))
+        self.update_extremes(float(prices.max()))
+        ema = om.current_ema
+        alpha = self.ema_alpha
+        for price in values:
+            if ema is None:
+                ema = price
+            else:
+                ema += alpha * (price - ema)
+        om.current_ema = ema
+        if om.track_distribution:
+            om.update_price_distribution_many(prices)
+        om.record_depth_span(first_tick, len(values) if record_last else len(values) - 1)
+
+    def apply_batch_intents(self, prices, first_tick):
+        # Как в check_orders: решения стратегии применяются до записи последнего тика
+        om = self.order_manager
+        times = np.arange(first_tick, self.tick + 1)
+        om.apply_intents(om.strategy.on_ticks(prices, times))
+
+    def run_batches(self, num_ticks, batch_size, chunk_size=10000):
+        remaining = num_ticks
+        while remaining > 0:
+            size = min(chunk_size, remaining)
+            prices = self.generate_prices(size)
+            for start in range(0, size, batch_size):
+                self.step_batch(prices[start : start + batch_size])
+            remaining -= size
+        return self.get_report()
+
+    def step_bar(self, open_price, high, low, close, ema_alpha=None, num_ticks=1):
+        close = float(close)
+        self.tick += 1
+        self.bars += 1
+        self.source_ticks += num_ticks
+        self.last_price = close
+        om = self.order_manager
+        om.price_history.append(close)
+        self.update_extremes(close)
+        if om.current_ema is None:
+            om.current_ema = close
+        else:
+            om.current_ema += (ema_alpha or self.ema_alpha) * (close - om.current_ema)
+        om.check_bar(float(open_price), float(high), float(low), close)
+        if self.recorder is not None:
+            self.recorder.record(om, self.tick)
+        if self.publisher is not None:
+            self.publisher.update(om, self.tick)
+        if self.risk_worker is not None and self.tick >= self.risk_worker.next_poll_tick:
+            self.update_risk()
+
+    def run_bar_prices(self, prices, timeframe):
+        # EMA пересчитывается так, чтобы период в тиках совпадал с тиковым режимом
+        bar_alpha = 1 - (1 - self.ema_alpha) ** timeframe
+        opens, highs, lows, closes = aggregate_ticks(prices, timeframe)
+        # Последний бар блока может быть неполным
+        counts = np.minimum(timeframe, len(prices) - np.arange(0, len(prices), timeframe))
+        for open_price, high, low, close, count in zip(opens, highs, lows, closes, counts.tolist()):
+            self.step_bar(open_price, high, low, close, ema_alpha=bar_alpha, num_ticks=count)
+
+    def run_bars(self, num_ticks, timeframe, chunk_size=100000):
+        # Блоки кратны таймфрейму, чтобы бары не резались на границах блоков
+        chunk_size = max(timeframe, chunk_size - chunk_size % timeframe)
+        remaining = num_ticks
+        while remaining > 0:
+            size = min(chunk_size, remaining)
+            self.run_bar_prices(self.generate_prices(size), timeframe)
+            remaining -= size
+        return self.get_report()
+
+    def run(self, num_ticks, chunk_size=10000):
+        remaining = num_ticks
+        while remaining > 0:
+            size = min(chunk_size, remaining)
+            self.run_prices(self.generate_prices(size))
+            remaining -= size
+        return self.get_report()
+
+    def get_report(self):
+        report = manager_report(self.order_manager, self.tick, self.last_price)
+        report["ticks"] = self.source_ticks
+        depth_buffer = self.order_manager.depth_buffer
+        if depth_buffer is not None:
+            report["depth_recenters"] = depth_buffer.recenter_count
+            report["depth_dropped_volume"] = depth_buffer.dropped_volume
+        if self.bars:
+            report["bars"] = self.bars
+        if self.last_risk is not None:
+            report["risk_tick"] = self.last_risk["tick"]
+            report["margin_exhaustion_probability"] = self.last_risk["margin_exhaustion_probability"]
+            report["expected_max_drawdown"] = self.last_risk["expected_max_drawdown"]
+        return report
+
+
+def manager_report(om, tick, price):
+    report = {
+        "ticks": tick + 1,
+        "price": price,
+        "balance": om.get_balance(),
+        "profit": om.profit,
+        "floating_profit": om.get_floating_profit(),
+        "free_margin": om.free_margin,
+        "total_commission": om.total_commission,
+        "open_positions": len(om.positions),
+        "closed_positions": len(om.closed_positions),
+        "executed_orders": len(om.order_history),
+    }
+    if om.current_price is not None:
+        report["free_margin"] = om.get_free_margin()
+    if om.instrument is not None:
+        report["realized_pnl"] = om.instrument.pnl(om.realized_units)
+    if om.last_allocation is not None:
+        report["last_allocation_trimmed_margin"] = om.last_allocation["trimmed_margin"]
+    return report
+
+
+MANAGER_ARGUMENTS = (
+    "grid_step_percent",
+    "min_grid_coverage",
+    "min_orders",
+    "max_orders",
+    "num_bins",
+    "allocation_policy",
+)
+
+
+class LockstepEngine:
+    # Много вариантов стратегии на одном потоке цен: цена, EMA, окно распределения
+    # и гистограмма считаются один раз на тик, затем тик раздается всем OrderManager.
+    # Вариант - словарь: аргументы конструктора OrderManager и/или его атрибуты
+    # (например volume_growth_factor, max_grid_step_multiplier).
+    def __init__(
+        self,
+        variants,
+        initial_price=100.0,
+        volatility=0.001,
+        initial_balance=10000.0,
+        commission_rate=0.00016,
+        grid_size=10,
+        ema_period=100,
+        seed=None,
+        instrument=None,
+    ):
+        self.variants = [dict(variant) for variant in variants]
+        self.initial_price = initial_price
+        self.volatility = volatility
+        self.ema_alpha = 2 / (ema_period + 1)
+        self.rng = np.random.default_rng(seed)
+        self.instrument = instrument
+        self.tick = -1
+        self.last_price = initial_price
+        self.current_ema = None
+        self.price_min = None
+        self.price_max = None
+
+        # Общие контейнеры: все варианты ссылаются на одни и те же объекты
+        self.price_history = []
+        self.price_distribution = []
+        self.price_frequency = {}
+        self.managers = [
+            self._build_manager(variant, initial_balance, commission_rate, grid_size)
+            for variant in self.variants
+        ]
+
+    def _build_manager(self, variant, initial_balance, commission_rate, grid_size):
+        arguments = {key: value for key, value in variant.items() if key in MANAGER_ARGUMENTS}
+        om = OrderManager(
+            initial_balance,
+            commission_rate,
+            grid_size,
+            None,
+            instrument=self.instrument,
+            **arguments,
+        )
+        for key, value in variant.items():
+            if key in MANAGER_ARGUMENTS:
+                continue
+            if not hasattr(om, key):
+                raise ValueError(f"Unknown variant parameter: {key}")
+            setattr(om, key, value)
+        om.price_history = self.price_history
+        om.price_distribution = self.price_distribution
+        om.price_frequency = self.price_frequency
+        om.track_distribution = False
+        return om
+
+    def generate_prices(self, num_ticks):
+        returns = self.rng.normal(0.0, self.volatility, num_ticks)
+        prices = self.last_price * np.exp(np.cumsum(returns))
+        if self.instrument is not None:
+            prices = self.instrument.round_prices(prices)
+        return prices
+
+    def step(self, price):
+        price = float(price)
+        self.tick += 1
+        self.last_price = price
+        self.price_history.append(price)
+
+        # Общая работа - один раз на тик
+        if self.current_ema is None:
+            self.current_ema = price
+            self.price_min = self.price_max = price
+        else:
+            self.current_ema += self.ema_alpha * (price - self.current_ema)
+            if price < self.price_min:
+                self.price_min = price
+            elif price > self.price_max:
+                self.price_max = price
+        # Контейнеры распределения общие, поэтому обновление через любой менеджер видят все
+        self.managers[0].update_price_distribution(price)
+        extremes = (self.price_min, self.price_max)
+
+        for om in self.managers:
+            om.current_ema = self.current_ema
+            om.price_extremes = extremes
+            om.check_orders(price)
+
+    def run_prices(self, prices):
+        for price in prices:
+            self.step(price)
+
+    def run(self, num_ticks, chunk_size=10000):
+        remaining = num_ticks
+        while remaining > 0:
+            size = min(chunk_size, remaining)
+            self.run_prices(self.generate_prices(size))
+            remaining -= size
+        return self.results()
+
+    def results(self):
+        return [
+            {"variant": variant, **manager_report(om, self.tick, self.last_price)}
+            for variant, om in zip(self.variants, self.managers)
+        ]
+
+
+def compare_bar_and_tick_modes(num_ticks, timeframe, seed=0, **engine_options):
+    # Прогоняет одну и ту же последовательность цен в тиковом и в баровом режиме
+    prices = SimulationEngine(seed=seed, **engine_options).generate_prices(num_ticks)
+    results = {}
+    for mode in ("tick", "bar"):
+        engine = SimulationEngine(seed=seed, **engine_options)
+        start_time = time.perf_counter()
+        if mode == "tick":
+            engine.run_prices(prices)
+        else:
+            engine.run_bar_prices(prices, timeframe)
+        elapsed = time.perf_counter() - start_time
+        report = engine.get_report()
+        report["elapsed"] = elapsed
+        results[mode] = report
+
+    tick_report, bar_report = results["tick"], results["bar"]
+    results["speedup"] = tick_report["elapsed"] / max(bar_report["elapsed"], 1e-9)
+    results["delta"] = {
+        key: bar_report[key] - tick_report[key]
+        for key in ("balance", "profit", "floating_profit", "executed_orders", "closed_positions")
+    }
+    return results
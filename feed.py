@@ -0,0 +1,237 @@
+import asyncio
+import time
+from collections import deque
+
+import numpy as np
+
+from bars import OHLCAggregator
+
+
+DROP_POLICIES = ("block", "drop_newest", "drop_oldest")
+
+
+def parse_tick(line):
+    # Формат строки: "price" или "price,timestamp"
+    fields = line.strip().split(",")
+    if not fields or not fields[0]:
+        return None
+    price = float(fields[0])
+    timestamp = float(fields[1]) if len(fields) > 1 and fields[1] else None
+    return price, timestamp
+
+
+class LatencyStats:
+    def __init__(self, window=100000):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.max = 0.0
+
+    def add_many(self, latencies):
+        self.samples.extend(latencies)
+        self.count += len(latencies)
+        if len(latencies):
+            self.max = max(self.max, float(np.max(latencies)))
+
+    def summary(self):
+        if not self.samples:
+            return {"count": 0}
+        samples = np.fromiter(self.samples, float, len(self.samples))
+        p50, p99 = np.percentile(samples, (50, 99))
+        return {
+            "count": self.count,
+            "mean_ms": float(samples.mean()) * 1000,
+            "p50_ms": float(p50) * 1000,
+            "p99_ms": float(p99) * 1000,
+            "max_ms": self.max * 1000,
+        }
+
+
+class LiveFeedAdapter:
+    # Читает тики из TCP-потока, буферизует в ограниченной очереди и отдает движку пачками.
+    # batch_mode="ticks" - пачка тиков идет в SimulationEngine.step_batch (стратегия
+    # вызывается раз на пачку, тики без исполнений обрабатываются блоком),
+    # batch_mode="bar" - тики собираются в OHLC-бары по bar_timeframe тиков (или секунд
+    # при bar_by_time=True, по метке времени фида) и идут в SimulationEngine.step_bar.
+    def __init__(
+        self,
+        engine,
+        host="127.0.0.1",
+        port=9000,
+        max_queue=10000,
+        batch_size=256,
+        drop_policy="block",
+        batch_mode="ticks",
+        bar_timeframe=None,
+        bar_by_time=False,
+    ):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+        if batch_mode not in ("ticks", "bar"):
+            raise ValueError(f"Unknown batch mode: {batch_mode}")
+        self.engine = engine
+        self.host = host
+        self.port = port
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.drop_policy = drop_policy
+        self.batch_mode = batch_mode
+        self.aggregator = OHLCAggregator(bar_timeframe or batch_size, by_time=bar_by_time)
+        # Время получения тиков текущего (еще не закрытого) бара - для задержки
+        self.bar_receive_times = []
+        self.queue = None
+        self.received = 0
+        self.processed = 0
+        self.dropped = 0
+        self.malformed = 0
+        self.batches = 0
+        self.bars = 0
+        self.latency = LatencyStats()
+
+    def _enqueue(self, item):
+        # Политики без блокировки: при переполнении теряем новый или самый старый тик
+        if not self.queue.full():
+            self.queue.put_nowait(item)
+        elif self.drop_policy == "drop_newest":
+            self.dropped += 1
+        else:  # drop_oldest
+            self.queue.get_nowait()
+            self.queue.put_nowait(item)
+            self.dropped += 1
+
+    async def _read(self, reader):
+        async for line in reader:
+            receive_time = time.perf_counter()
+            try:
+                tick = parse_tick(line.decode())
+            except ValueError:
+                # Служебные и битые строки (например, HEARTBEAT) пропускаются
+                self.malformed += 1
+                continue
+            if tick is None:
+                continue
+            self.received += 1
+            # Без метки времени фида бары по времени строятся по времени получения
+            item = (tick[0], receive_time, tick[1] if tick[1] is not None else time.time())
+            if self.drop_policy == "block":
+                # Пока очередь полна, сокет не читается - работает TCP flow control
+                await self.queue.put(item)
+            else:
+                self._enqueue(item)
+                # readline не уступает управление, пока в буфере есть данные,
+                # поэтому периодически отдаем ход обработчику пачек
+                if self.received % self.batch_size == 0:
+                    await asyncio.sleep(0)
+        await self.queue.put(None)
+
+    def _process_batch(self, batch):
+        if self.batch_mode == "bar":
+            for price, received, timestamp in batch:
+                completed = self.aggregator.add_tick(price, timestamp)
+                if completed is not None:
+                    # Тик, открывший новый бар, к закрытому бару не относится
+                    self._process_bar(completed, self.bar_receive_times)
+                    self.bar_receive_times = []
+                self.bar_receive_times.append(received)
+            self.batches += 1
+            return
+        prices = np.fromiter((price for price, _, _ in batch), float, len(batch))
+        self.engine.step_batch(prices)
+        self._record_latency([received for _, received, _ in batch])
+        self.processed += len(batch)
+        self.batches += 1
+
+    def _process_bar(self, bar, receive_times):
+        # EMA по бару с тем же периодом в тиках, что и в тиковом режиме
+        bar_alpha = 1 - (1 - self.engine.ema_alpha) ** bar.ticks
+        self.engine.step_bar(
+            bar.open, bar.high, bar.low, bar.close, ema_alpha=bar_alpha, num_ticks=bar.ticks
+        )
+        self._record_latency(receive_times)
+        self.processed += bar.ticks
+        self.bars += 1
+
+    def _flush_bar(self):
+        completed = self.aggregator.flush()
+        if completed is not None:
+            self._process_bar(completed, self.bar_receive_times)
+            self.bar_receive_times = []
+
+    def _record_latency(self, receive_times):
+        decision_time = time.perf_counter()
+        receive_times = np.fromiter(receive_times, float, len(receive_times))
+        self.latency.add_many(decision_time - receive_times)
+
+    async def _consume(self):
+        finished = False
+        while not finished:
+            item = await self.queue.get()
+            if item is None:
+                break
+            # Забираем все, что уже накопилось: в тишине пачка из одного тика,
+            # во время всплеска - до batch_size тиков за один проход
+            batch = [item]
+            while len(batch) < self.batch_size and not self.queue.empty():
+                item = self.queue.get_nowait()
+                if item is None:
+                    finished = True
+                    break
+                batch.append(item)
+            self._process_batch(batch)
+            # Даем циклу событий прочитать сеть между пачками
+            await asyncio.sleep(0)
+        if self.batch_mode == "bar":
+            self._flush_bar()
+
+    async def run(self):
+        self.queue = asyncio.Queue(maxsize=self.max_queue)
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            await asyncio.gather(self._read(reader), self._consume())
+        finally:
+            writer.close()
+            await writer.wait_closed()
+        return self.stats()
+
+    def stats(self):
+        return {
+            "received": self.received,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "malformed": self.malformed,
+            "batches": self.batches,
+            "bars": self.bars,
+            "latency": self.latency.summary(),
+        }
+
+
+async def start_replay_server(prices, host="127.0.0.1", port=9000, rate=None, burst=100):
+    # Локальная замена живого фида: отдает цены каждому клиенту строками "price,timestamp".
+    # rate - тиков в секунду (None - максимально быстро), burst - тиков за одну запись.
+    async def handle(reader, writer):
+        try:
+            for start in range(0, len(prices), burst):
+                chunk = prices[start : start + burst]
+                now = time.time()
+                writer.write("".join(f"{price},{now}\n" for price in chunk).encode())
+                await writer.drain()
+                if rate:
+                    await asyncio.sleep(len(chunk) / rate)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+
+async def replay_through_adapter(engine, prices, host="127.0.0.1", port=0, rate=None, **adapter_options):
+    # Поднимает локальный сервер и прогоняет через адаптер, удобно для проверки без реального фида
+    server = await start_replay_server(prices, host, port, rate=rate)
+    port = server.sockets[0].getsockname()[1]
+    async with server:
+        adapter = LiveFeedAdapter(engine, host, port, **adapter_options)
+        return await adapter.run()
+
+
+def run_live_feed(engine, host, port, **adapter_options):
+    return asyncio.run(LiveFeedAdapter(engine, host, port, **adapter_options).run())
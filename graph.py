@@ -1,4 +1,7 @@
+from bisect import bisect_left
+
 from PyQt5 import QtWidgets, QtCore
+import numpy as np
 import pyqtgraph as pg
 
 
@@ -12,6 +15,10 @@ class MarketGraph(QtWidgets.QWidget):
         self.visible_range = 1000  # Количество точек, отображаемых на графике
         self.data_offset = 0  # Смещение данных для скроллинга
         self.distribution_data = None
+        self.depth_buffer = None
+        self.timeline = None
+        self.positions_window = None
+        self.full_balance_history = None
 
     def init_ui(self):
         # Основной вертикальный layout
@@ -80,6 +87,16 @@ class MarketGraph(QtWidgets.QWidget):
         self.graphWidget.addItem(self.order_history_curve)
         self.order_book_item = pg.GraphItem()
         self.graphWidget.addItem(self.order_book_item)
+        # Тепловая карта объема стакана во времени (под линией цены)
+        self.depth_image = pg.ImageItem()
+        self.depth_image.setZValue(-10)
+        depth_colormap = pg.ColorMap(
+            [0.0, 0.5, 1.0], [(255, 0, 0, 200), (0, 0, 0, 0), (0, 255, 0, 200)]
+        )
+        self.depth_image.setLookupTable(depth_colormap.getLookupTable(0.0, 1.0, 256))
+        self.depth_image.hide()
+        self.graphWidget.addItem(self.depth_image)
+        self.graphWidget.getViewBox().sigXRangeChanged.connect(self.update_depth_heatmap)
         self.graphWidget.setMouseEnabled(x=True, y=False)
         self.graphWidget.setAutoVisible(y=True)
 
@@ -87,54 +104,76 @@ class MarketGraph(QtWidgets.QWidget):
         self.balance_curve = self.balance_graph.plot(pen=pg.mkPen("g", width=1), name="Balance")
         self.free_margin_curve = self.balance_graph.plot(pen=pg.mkPen("b", width=1), name="Free Margin")
         self.margin_curve = self.balance_graph.plot(pen=pg.mkPen("r", width=1), name="Margin")
-        # Инициализация элементов гистограммы
+        # Прогноз риска: полосы процентилей эквити на горизонте вперед
+        self.risk_upper_curve = pg.PlotDataItem(pen=pg.mkPen(255, 165, 0, 120))
+        self.risk_lower_curve = pg.PlotDataItem(pen=pg.mkPen(255, 165, 0, 120))
+        self.risk_median_curve = self.balance_graph.plot(pen=pg.mkPen(255, 165, 0, width=1, style=QtCore.Qt.DashLine))
+        self.risk_band = pg.FillBetweenItem(self.risk_lower_curve, self.risk_upper_curve, brush=pg.mkBrush(255, 165, 0, 40))
+        self.balance_graph.addItem(self.risk_upper_curve)
+        self.balance_graph.addItem(self.risk_lower_curve)
+        self.balance_graph.addItem(self.risk_band)
+        # Инициализация элементов гистограммы (создаются один раз и обновляются на месте)
         self.histogram_bars = pg.BarGraphItem(x=[], height=[], width=0.8, brush='g')
-        self.normal_curve = self.distribution_graph.plot(pen='r')
-        self.current_price_line_hist = pg.InfiniteLine(angle=90, movable=False, pen='b')
+        self.normal_curve = self.distribution_graph.plot(pen=pg.mkPen('r', width=2))
+        self.current_price_line_hist = pg.InfiniteLine(angle=90, movable=False, pen=pg.mkPen('b', width=2))
         self.distribution_graph.addItem(self.histogram_bars)
         self.distribution_graph.addItem(self.current_price_line_hist)
+        self.distribution_graph.setLabel('left', 'Normalized Frequency')
+        self.distribution_graph.setYRange(0, 1.1)  # Нормализованный диапазон от 0 до 1
+        self._hist_brushes = np.array([pg.mkBrush('g'), pg.mkBrush('r')], dtype=object)
+        self._hist_edges = None
+        self._hist_values = None
 
     def update_distribution_chart(self):
-        if self.distribution_data:
-            hist = self.distribution_data['hist']
-            bin_edges = self.distribution_data['bin_edges']
-            normal_dist = self.distribution_data['normal_dist']
-            x = self.distribution_data['x']
-            current_price = self.distribution_data['current_price']
-
-            # Очищаем график перед обновлением
-            self.distribution_graph.clear()
-
-            # Создаем новый BarGraphItem для гистограммы
-            bar_positions = [(bin_edges[i] + bin_edges[i+1])/2 for i in range(len(bin_edges)-1)]
-            colors = ['g' if abs(h - n) <= 0.2 else 'r' for h, n in zip(hist, normal_dist)]
-            
-            # Нормализуем высоту столбцов гистограммы
-            max_height = max(max(hist), max(normal_dist))
-            normalized_hist = [h / max_height for h in hist]
-            
-            self.histogram_bars = pg.BarGraphItem(x=bar_positions, height=normalized_hist, width=(bin_edges[1]-bin_edges[0])*0.8, brushes=colors)
-            self.distribution_graph.addItem(self.histogram_bars)
+        if not self.distribution_data:
+            return
 
-            # Обновляем нормальную кривую
-            normalized_normal_dist = [n / max_height for n in normal_dist]
-            self.normal_curve = self.distribution_graph.plot(x, normalized_normal_dist, pen=pg.mkPen('r', width=2))
+        hist = np.asarray(self.distribution_data["hist"], dtype=float)
+        bin_edges = np.asarray(self.distribution_data["bin_edges"], dtype=float)
+        normal_dist = np.asarray(self.distribution_data["normal_dist"], dtype=float)
+        x = np.asarray(self.distribution_data["x"], dtype=float)
+        current_price = self.distribution_data["current_price"]
 
-            # Обновляем линию текущей цены
-            self.current_price_line_hist = pg.InfiniteLine(angle=90, movable=False, pen=pg.mkPen('b', width=2))
-            self.distribution_graph.addItem(self.current_price_line_hist)
+        # Линия текущей цены двигается на каждом обновлении, это дешево
+        if current_price is not None:
             self.current_price_line_hist.setValue(current_price)
 
-            # Настраиваем оси
-            self.distribution_graph.setLabel('left', 'Normalized Frequency')
-            self.distribution_graph.setLabel('bottom', 'Price')
-
-            # Устанавливаем диапазон осей
-            x_min, x_max = min(bin_edges), max(bin_edges)
-            x_range = x_max - x_min
-            self.distribution_graph.setXRange(x_min - 0.1*x_range, x_max + 0.1*x_range)
-            self.distribution_graph.setYRange(0, 1.1)  # Нормализованный диапазон от 0 до 1
+        # Перерисовываем столбцы только если бины действительно изменились
+        if (
+            self._hist_edges is not None
+            and self._hist_values is not None
+            and self._hist_edges.shape == bin_edges.shape
+            and np.array_equal(self._hist_edges, bin_edges)
+            and np.array_equal(self._hist_values, hist)
+        ):
+            return
+        self._hist_edges = bin_edges
+        self._hist_values = hist
+
+        # Нормализуем высоту столбцов гистограммы
+        max_height = max(hist.max(initial=0.0), normal_dist.max(initial=0.0))
+        if max_height <= 0:
+            max_height = 1.0
+        normalized_hist = hist / max_height
+        normalized_normal_dist = normal_dist / max_height
+
+        # Центры столбцов и цвета считаются векторно
+        bar_positions = 0.5 * (bin_edges[:-1] + bin_edges[1:])
+        bar_width = (bin_edges[1] - bin_edges[0]) * 0.8 if len(bin_edges) > 1 else 0.8
+        # Для сравнения с нормальной кривой берем её значения в центрах бинов
+        normal_at_bars = np.interp(bar_positions, x, normalized_normal_dist)
+        outliers = np.abs(normalized_hist - normal_at_bars) > 0.2
+        brushes = self._hist_brushes[outliers.astype(np.intp)]
+
+        self.histogram_bars.setOpts(
+            x=bar_positions, height=normalized_hist, width=bar_width, brushes=list(brushes)
+        )
+        self.normal_curve.setData(x, normalized_normal_dist)
 
+        # Устанавливаем диапазон осей
+        x_min, x_max = bin_edges[0], bin_edges[-1]
+        x_range = x_max - x_min
+        self.distribution_graph.setXRange(x_min - 0.1 * x_range, x_max + 0.1 * x_range)
 
     def update_graph(self, price_data):
         if len(price_data) > self.visible_range:
@@ -154,6 +193,18 @@ class MarketGraph(QtWidgets.QWidget):
             self.ema_curve.show()
 
 
+    def update_risk_overlay(self, risk):
+        bands = risk["equity_bands"]
+        x = np.arange(risk["tick"] + 1, risk["tick"] + 1 + risk["horizon"])
+        self.risk_lower_curve.setData(x, bands[5])
+        self.risk_upper_curve.setData(x, bands[95])
+        self.risk_median_curve.setData(x, bands[50])
+        self.balance_graph.setTitle(
+            f"Balance, Free Margin, and Margin (margin exhaustion: "
+            f"{risk['margin_exhaustion_probability']:.1%}, expected drawdown: "
+            f"{risk['expected_max_drawdown']:.2f})"
+        )
+
     def update_report(self, balance, profit, floating_profit, free_margin, total_commission):
         self.report_label.setText(
             f"Balance: {balance:.2f}, Profit: {profit:.2f}, Floating Profit: {floating_profit:.2f}, "
@@ -170,15 +221,23 @@ class MarketGraph(QtWidgets.QWidget):
             self.orders_table.setItem(i, 4, QtWidgets.QTableWidgetItem(f"{order.volume:.8f}"))
             self.orders_table.setItem(i, 5, QtWidgets.QTableWidgetItem(f"{order.profit:.8f}"))
 
-    def update_balance_graph(self, balance_history, free_margin_history, margin_history):
-        if balance_history and free_margin_history and margin_history:
-            x = list(range(len(balance_history)))
+    def update_balance_graph(self, balance_history, free_margin_history, margin_history, x=None):
+        # Полные ряды сохраняются для прокрутки в прошлое (show_timeline_snapshot);
+        # x - номера тиков, если ряды начинаются не с нулевого тика
+        if x is None:
+            self.full_balance_history = (balance_history, free_margin_history, margin_history)
+        self.plot_balance(balance_history, free_margin_history, margin_history, x)
+
+    def plot_balance(self, balance_history, free_margin_history, margin_history, x=None):
+        if len(balance_history) and len(free_margin_history) and len(margin_history):
+            if x is None:
+                x = np.arange(len(balance_history))
             self.balance_curve.setData(x, balance_history)
             self.free_margin_curve.setData(x, free_margin_history)
             self.margin_curve.setData(x, margin_history)
             
             # Обновляем диапазон осей
-            self.balance_graph.setXRange(0, len(balance_history))
+            self.balance_graph.setXRange(x[0], x[-1] + 1)
             min_y = min(min(balance_history), min(free_margin_history), min(margin_history))
             max_y = max(max(balance_history), max(free_margin_history), max(margin_history))
             self.balance_graph.setYRange(min_y, max_y)
@@ -195,6 +254,17 @@ class MarketGraph(QtWidgets.QWidget):
         self.balance_curve.setData([], [])
         self.free_margin_curve.setData([], [])
         self.margin_curve.setData([], [])
+        self.risk_lower_curve.setData([], [])
+        self.risk_upper_curve.setData([], [])
+        self.risk_median_curve.setData([], [])
+        self.balance_graph.setTitle("Balance, Free Margin, and Margin")
+        self.depth_image.clear()
+        self.depth_image.hide()
+        self.histogram_bars.setOpts(x=[], height=[], brushes=None)
+        self.normal_curve.setData([], [])
+        self._hist_edges = None
+        self._hist_values = None
+        self.distribution_data = None
         self.orders_table.setRowCount(0)
         self.report_label.setText("")
         print("Graph cleared")
@@ -217,8 +287,101 @@ class MarketGraph(QtWidgets.QWidget):
 
         self.graphWidget.setXRange(start, end)
         
-        self.update_order_book(self.full_buy_orders, self.full_sell_orders, end - 1, self.full_price_data[-1])
-        self.update_order_history(self.full_order_history)
+        if self.timeline is not None and end < len(self.full_price_data):
+            # Прокрутка в прошлое: все панели показывают состояние на последний видимый тик
+            self.show_timeline_snapshot(end - 1, start)
+        else:
+            self.update_order_book(self.full_buy_orders, self.full_sell_orders, end - 1, self.full_price_data[-1])
+            self.update_order_history(self.full_order_history, start, end)
+        self.update_depth_heatmap()
+
+    def set_timeline(self, timeline):
+        self.timeline = timeline
+
+    def set_positions_window(self, positions_window):
+        self.positions_window = positions_window
+
+    def show_timeline_snapshot(self, tick, start=None):
+        # Те же методы обновления, что и в живом режиме, но с данными таймлайна
+        start = max(0, tick + 1 - self.visible_range) if start is None else start
+        snapshot = self.timeline.snapshot(tick, self.full_price_data[tick], start)
+        buy_orders, sell_orders = snapshot["buy_orders"], snapshot["sell_orders"]
+        self.update_order_book(buy_orders, sell_orders, tick, snapshot["price"])
+        self.update_order_history(snapshot["executions"], start, tick + 1)
+        self.update_orders_table(buy_orders + sell_orders)
+        self.update_report(
+            snapshot["balance"],
+            snapshot["realized_profit"],
+            snapshot["floating_profit"],
+            snapshot["free_margin"],
+            snapshot["total_commission"],
+        )
+        if self.full_balance_history is not None:
+            self.plot_balance(*(history[: tick + 1] for history in self.full_balance_history))
+        if self.positions_window is not None:
+            self.positions_window.update_positions(
+                snapshot["open_positions"], snapshot["closed_positions"], snapshot["price"]
+            )
+
+    def attach_state_reader(self, reader, interval_ms=200):
+        # Просмотр движка из другого процесса (см. publisher.StatePublisher)
+        self.state_reader = reader
+        self.state_timer = QtCore.QTimer(self)
+        self.state_timer.timeout.connect(self.poll_published_state)
+        self.state_timer.start(interval_ms)
+
+    def poll_published_state(self):
+        state = self.state_reader.read()
+        if state is not None:
+            self.show_published_state(state)
+        if self.state_reader.finished:
+            self.state_timer.stop()
+
+    def show_published_state(self, state):
+        start = state.tick - len(state.prices) + 1
+        self.price_curve.setData(np.arange(start, state.tick + 1), state.prices)
+        self.graphWidget.setXRange(start, state.tick + 1)
+        self.update_order_book(state.buy_orders(), state.sell_orders(), state.tick, state.price)
+        self.report_label.setText(
+            f"Tick {state.tick}: Equity: {state.equity:.2f}, Balance: {state.balance:.2f}, "
+            f"Free Margin: {state.free_margin:.2f}, Profit: {state.profit:.2f}, "
+            f"Floating Profit: {state.floating_profit:.2f}, Open Positions: {len(state.positions)}"
+        )
+        if self.positions_window is not None:
+            # Публикуется только открытая часть книги - закрытых позиций в состоянии нет
+            self.positions_window.update_positions(state.open_positions(), [], state.price)
+
+    def set_depth_buffer(self, depth_buffer):
+        self.depth_buffer = depth_buffer
+        self.update_depth_heatmap()
+
+    def update_depth_heatmap(self, *args):
+        if self.depth_buffer is None or len(self.depth_buffer) == 0:
+            self.depth_image.hide()
+            return
+
+        # Берем только видимый участок и прореживаем до ширины графика в пикселях
+        (x_min, x_max), _ = self.graphWidget.getViewBox().viewRange()
+        max_columns = max(1, int(self.graphWidget.getViewBox().width()))
+        depth = self.depth_buffer.get_image(
+            int(np.floor(x_min)), int(np.ceil(x_max)), max_columns=max_columns
+        )
+        if depth is None:
+            self.depth_image.hide()
+            return
+
+        image = depth["image"]
+        max_volume = float(np.abs(image).max(initial=0.0)) or 1.0
+        self.depth_image.setImage(image, autoLevels=False, levels=(-max_volume, max_volume))
+        self.depth_image.setRect(
+            QtCore.QRectF(
+                depth["tick_start"],
+                depth["price_min"],
+                depth["tick_end"] - depth["tick_start"],
+                depth["price_max"] - depth["price_min"],
+            )
+        )
+        self.depth_image.show()
 
     def update_order_book(self, buy_orders, sell_orders, current_time, current_price):
         # Фильтруем ордера в видимом диапазоне
@@ -253,8 +416,14 @@ class MarketGraph(QtWidgets.QWidget):
             padding = price_range * 0.1
             self.graphWidget.setYRange(min_price - padding, max_price + padding)
 
-    def update_order_history(self, order_history):
-        visible_history = order_history[-self.visible_range:]
+    def update_order_history(self, order_history, start=None, end=None):
+        if start is None or end is None:
+            visible_history = order_history[-self.visible_range:]
+        else:
+            # История упорядочена по времени исполнения - берем только видимое окно
+            first = bisect_left(order_history, start, key=lambda order: order.execution_time)
+            last = bisect_left(order_history, end, key=lambda order: order.execution_time)
+            visible_history = order_history[first:last]
         history_spots = []
         for order in visible_history:
             if order.executed:
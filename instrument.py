@@ -0,0 +1,46 @@
+import numpy as np
+
+
+class InstrumentSpec:
+    # Параметры инструмента для целочисленного режима: цены хранятся в тиках,
+    # объемы в лотах (int64), обратно во float переводятся только для отображения
+    def __init__(self, tick_size, lot_size=1.0, symbol=None):
+        if tick_size <= 0 or lot_size <= 0:
+            raise ValueError("tick_size and lot_size must be positive")
+        self.tick_size = float(tick_size)
+        self.lot_size = float(lot_size)
+        self.symbol = symbol
+        # Стоимость одного тика на один лот
+        self.tick_value = self.tick_size * self.lot_size
+
+    def to_ticks(self, price):
+        return int(round(price / self.tick_size))
+
+    def to_price(self, ticks):
+        return ticks * self.tick_size
+
+    def to_lots(self, volume):
+        # Объем округляется вниз, чтобы квантование не увеличивало требуемую маржу
+        return int(np.floor(volume / self.lot_size + 1e-9))
+
+    def to_volume(self, lots):
+        return lots * self.lot_size
+
+    def round_price(self, price):
+        return self.to_price(self.to_ticks(price))
+
+    def ticks_array(self, prices):
+        return np.rint(np.asarray(prices, dtype=float) / self.tick_size).astype(np.int64)
+
+    def round_prices(self, prices):
+        return self.ticks_array(prices) * self.tick_size
+
+    def lots_array(self, volumes):
+        return np.floor(np.asarray(volumes, dtype=float) / self.lot_size + 1e-9).astype(np.int64)
+
+    def round_volumes(self, volumes):
+        return self.lots_array(volumes) * self.lot_size
+
+    def pnl(self, ticks_times_lots):
+        # Точная сумма в целых (тики * лоты) переводится в деньги один раз
+        return ticks_times_lots * self.tick_value
@@ -0,0 +1,265 @@
+import struct
+
+import numpy as np
+
+
+JOURNAL_MAGIC = b"GRJ1"
+HEADER = struct.Struct("<4sII")  # magic, версия, размер записи
+
+EVENT_KINDS = (
+    "order_placed",
+    "order_moved",
+    "order_resized",  # Зарезервировано: объем теперь задается при размещении, код сохранен для формата
+    "order_cancelled",
+    "order_filled",
+    "position_opened",
+    "position_closed",
+    "grid_rebuilt",
+    "orders_cleared",
+)
+EVENT_CODES = {kind: code for code, kind in enumerate(EVENT_KINDS)}
+SIDE_CODES = {None: 0, "buy": 1, "sell": 2}
+SIDE_NAMES = (None, "buy", "sell")
+
+# Запись фиксированной длины: seq, tick, kind, side, id, value_a, value_b.
+# Значения по типам событий:
+#   order_placed / order_filled / position_opened: a = цена, b = объем
+#   order_moved: a = цена
+#   position_closed: a = цена выхода, b = прибыль
+#   grid_rebuilt: a = цена, b = EMA
+RECORD = struct.Struct("<QqBBxxxxxxqdd")
+RECORD_DTYPE = np.dtype(
+    {
+        "names": ["seq", "tick", "kind", "side", "id", "a", "b"],
+        "formats": ["<u8", "<i8", "u1", "u1", "<i8", "<f8", "<f8"],
+        "offsets": [0, 8, 16, 17, 24, 32, 40],
+        "itemsize": RECORD.size,
+    }
+)
+JOURNAL_VERSION = 1
+
+
+def encode_event(kind, fields):
+    # Событие OrderManager -> (код, сторона, id, a, b) в формате записи журнала
+    side = SIDE_CODES[fields.get("side")]
+    event_id = fields.get("id", -1)
+    if kind == "order_moved":
+        a, b = fields["price"], 0.0
+    elif kind == "position_closed":
+        a, b = fields["price"], fields["profit"]
+    elif kind == "grid_rebuilt":
+        a, b = fields["price"], fields["ema"]
+    elif kind in ("order_cancelled", "orders_cleared"):
+        a, b = 0.0, 0.0
+    else:
+        a, b = fields["price"], fields["volume"]
+    return EVENT_CODES[kind], side, event_id, a, b
+
+
+class JournalWriter:
+    # Слушатель событий OrderManager (event_listeners), пишущий бинарный журнал.
+    # Записи копятся в bytearray и сбрасываются на диск блоками по buffer_records.
+    def __init__(self, path, buffer_records=8192):
+        self.path = path
+        self.buffer_records = buffer_records
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(JOURNAL_MAGIC, JOURNAL_VERSION, RECORD.size))
+        self.buffer = bytearray(buffer_records * RECORD.size)
+        self.buffered = 0
+        self.seq = 0
+
+    def __call__(self, tick, kind, fields):
+        code, side, event_id, a, b = encode_event(kind, fields)
+        RECORD.pack_into(
+            self.buffer,
+            self.buffered * RECORD.size,
+            self.seq,
+            tick,
+            code,
+            side,
+            event_id,
+            a,
+            b,
+        )
+        self.seq += 1
+        self.buffered += 1
+        if self.buffered == self.buffer_records:
+            self.flush()
+
+    def __len__(self):
+        return self.seq
+
+    def flush(self):
+        if self.buffered:
+            self.file.write(memoryview(self.buffer)[: self.buffered * RECORD.size])
+            self.buffered = 0
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def iter_journal_chunks(path, chunk_records=65536):
+    # Журнал читается блоками структурированных массивов - память ограничена размером блока
+    with open(path, "rb") as source:
+        header = source.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise ValueError(f"{path}: truncated journal header")
+        magic, version, record_size = HEADER.unpack(header)
+        if magic != JOURNAL_MAGIC or record_size != RECORD.size:
+            raise ValueError(f"{path}: not a journal file (version {version})")
+        while True:
+            data = source.read(chunk_records * RECORD.size)
+            if not data:
+                break
+            # Недописанный хвост (например, после падения процесса) отбрасывается
+            usable = len(data) - len(data) % RECORD.size
+            if usable:
+                yield np.frombuffer(data[:usable], dtype=RECORD_DTYPE)
+            if usable < len(data):
+                break
+
+
+def read_journal(path):
+    chunks = list(iter_journal_chunks(path))
+    if not chunks:
+        return np.empty(0, dtype=RECORD_DTYPE)
+    return np.concatenate(chunks)
+
+
+def record_to_dict(record):
+    return {
+        "seq": int(record["seq"]),
+        "tick": int(record["tick"]),
+        "kind": EVENT_KINDS[record["kind"]],
+        "side": SIDE_NAMES[record["side"]],
+        "id": int(record["id"]),
+        "a": float(record["a"]),
+        "b": float(record["b"]),
+    }
+
+
+class _JournalStream:
+    # Поток записей блоками; по ходу чтения копит сводную статистику
+    def __init__(self, path, chunk_records):
+        self.chunks = iter_journal_chunks(path, chunk_records)
+        self.pending = np.empty(0, dtype=RECORD_DTYPE)
+        self.kind_counts = np.zeros(len(EVENT_KINDS), dtype=np.int64)
+        self.realized_profit = 0.0
+        self.filled_volume = 0.0
+        self.last_tick = -1
+        self.total = 0
+
+    def fill(self):
+        if not len(self.pending):
+            self.pending = next(self.chunks, self.pending)
+        return len(self.pending)
+
+    def take(self, count):
+        block = self.pending[:count]
+        self.pending = self.pending[count:]
+        if len(block):
+            self.kind_counts += np.bincount(block["kind"], minlength=len(EVENT_KINDS))
+            closed = block["kind"] == EVENT_CODES["position_closed"]
+            self.realized_profit += float(block["b"][closed].sum())
+            filled = block["kind"] == EVENT_CODES["order_filled"]
+            self.filled_volume += float(block["b"][filled].sum())
+            self.last_tick = int(block["tick"][-1])
+            self.total += len(block)
+        return block
+
+
+def _first_mismatch(left, right, tolerance):
+    same = (
+        (left["tick"] == right["tick"])
+        & (left["kind"] == right["kind"])
+        & (left["side"] == right["side"])
+        & (left["id"] == right["id"])
+    )
+    if tolerance > 0:
+        same &= np.abs(left["a"] - right["a"]) <= tolerance
+        same &= np.abs(left["b"] - right["b"]) <= tolerance
+    else:
+        same &= (left["a"] == right["a"]) & (left["b"] == right["b"])
+    mismatched = np.flatnonzero(~same)
+    return int(mismatched[0]) if len(mismatched) else None
+
+
+def diff_journals(left_path, right_path, tolerance=0.0, chunk_records=65536):
+    # Потоковое сравнение двух журналов: первая расходящаяся запись и сводные дельты.
+    # Оба файла читаются выровненными блоками, в памяти не больше двух блоков.
+    # seq не сравнивается - он совпадает с позицией записи в файле.
+    left = _JournalStream(left_path, chunk_records)
+    right = _JournalStream(right_path, chunk_records)
+    divergence = None
+    while True:
+        left_size = left.fill()
+        right_size = right.fill()
+        if not left_size and not right_size:
+            break
+        size = min(left_size, right_size)
+        if not size:
+            # Один журнал закончился раньше: расхождение - первая лишняя запись другого
+            if divergence is None:
+                divergence = {
+                    "index": left.total,
+                    "left": record_to_dict(left.pending[0]) if left_size else None,
+                    "right": record_to_dict(right.pending[0]) if right_size else None,
+                }
+            left.take(left_size)
+            right.take(right_size)
+            continue
+
+        index = left.total
+        left_block = left.take(size)
+        right_block = right.take(size)
+        if divergence is None:
+            offset = _first_mismatch(left_block, right_block, tolerance)
+            if offset is not None:
+                divergence = {
+                    "index": index + offset,
+                    "left": record_to_dict(left_block[offset]),
+                    "right": record_to_dict(right_block[offset]),
+                }
+
+    return {
+        "first_divergence": divergence,
+        "records": (left.total, right.total),
+        "last_tick": (left.last_tick, right.last_tick),
+        "counts": {
+            kind: (int(left.kind_counts[code]), int(right.kind_counts[code]))
+            for code, kind in enumerate(EVENT_KINDS)
+        },
+        "realized_profit": (left.realized_profit, right.realized_profit),
+        "filled_volume": (left.filled_volume, right.filled_volume),
+    }
+
+
+def format_journal_diff(diff):
+    lines = []
+    divergence = diff["first_divergence"]
+    if divergence is None:
+        lines.append("journals are identical")
+    else:
+        lines.append(f"first divergence at record {divergence['index']}")
+        lines.append(f"  left:  {divergence['left']}")
+        lines.append(f"  right: {divergence['right']}")
+    left_total, right_total = diff["records"]
+    lines.append(f"records: {left_total} vs {right_total} ({right_total - left_total:+d})")
+    left_tick, right_tick = diff["last_tick"]
+    lines.append(f"last tick: {left_tick} vs {right_tick}")
+    for kind, (left_count, right_count) in diff["counts"].items():
+        if left_count or right_count:
+            lines.append(f"  {kind}: {left_count} vs {right_count} ({right_count - left_count:+d})")
+    for key in ("realized_profit", "filled_volume"):
+        left_value, right_value = diff[key]
+        lines.append(f"{key}: {left_value} vs {right_value} ({right_value - left_value:+.10g})")
+    return "\n".join(lines)
@@ -0,0 +1,121 @@
+import csv
+
+import numpy as np
+
+
+LEDGER_COLUMNS = (
+    "price",
+    "fills",
+    "realized_profit",
+    "commission",
+    "closed_positions",
+    "average_holding_time",
+    "open_volume",
+)
+
+
+class LevelStats:
+    __slots__ = ("fills", "realized_profit", "commission", "closed", "holding_time", "open_volume")
+
+    def __init__(self):
+        self.fills = 0
+        self.realized_profit = 0.0
+        self.commission = 0.0
+        self.closed = 0
+        self.holding_time = 0
+        self.open_volume = 0.0  # Покупки со знаком плюс, продажи - минус
+
+    def average_holding_time(self):
+        return self.holding_time / self.closed if self.closed else 0.0
+
+
+class TradeLedger:
+    # Накопительная статистика по ценовым уровням сетки. Обновляется при исполнении
+    # ордера и закрытии позиции, поэтому запросы не требуют обхода closed_positions.
+    # Уровень - цена, квантованная шагом level_size (или тиками инструмента).
+    # realized_profit - валовой P&L, комиссии всех исполнений - в столбце commission.
+    def __init__(self, level_size=0.01, instrument=None):
+        self.level_size = level_size
+        self.instrument = instrument
+        self.levels = {}
+
+    def level_key(self, price):
+        if self.instrument is not None:
+            return self.instrument.to_ticks(price)
+        return int(round(price / self.level_size))
+
+    def level_price(self, key):
+        if self.instrument is not None:
+            return self.instrument.to_price(key)
+        return key * self.level_size
+
+    def _stats(self, price):
+        key = self.level_key(price)
+        stats = self.levels.get(key)
+        if stats is None:
+            stats = self.levels[key] = LevelStats()
+        return stats
+
+    def record_fill(self, order):
+        stats = self._stats(order.execution_price)
+        stats.fills += 1
+        stats.commission += order.commission
+
+    def record_open(self, position):
+        sign = 1 if position.order_type == "buy" else -1
+        self._stats(position.entry_price).open_volume += sign * position.volume
+
+    def record_close(self, position, exit_time=None):
+        # P&L относится к уровню, на котором позиция была открыта
+        stats = self._stats(position.entry_price)
+        sign = 1 if position.order_type == "buy" else -1
+        stats.open_volume -= sign * position.volume
+        # position.profit уже за вычетом комиссии открытия, а комиссия учтена в record_fill -
+        # здесь P&L берется валовым, чтобы не вычитать ее дважды
+        stats.realized_profit += position.profit + position.commission
+        stats.closed += 1
+        if exit_time is not None and position.entry_time is not None:
+            stats.holding_time += exit_time - position.entry_time
+
+    def level(self, price):
+        stats = self.levels.get(self.level_key(price))
+        if stats is None:
+            return None
+        return self._row(self.level_key(price), stats)
+
+    def _row(self, key, stats):
+        return {
+            "price": self.level_price(key),
+            "fills": stats.fills,
+            "realized_profit": stats.realized_profit,
+            "commission": stats.commission,
+            "closed_positions": stats.closed,
+            "average_holding_time": stats.average_holding_time(),
+            "open_volume": stats.open_volume,
+        }
+
+    def rows(self):
+        return [self._row(key, self.levels[key]) for key in sorted(self.levels)]
+
+    def to_arrays(self):
+        # Столбцы по возрастанию цены - готовые оси для тепловой карты
+        keys = sorted(self.levels)
+        stats = [self.levels[key] for key in keys]
+        return {
+            "price": np.array([self.level_price(key) for key in keys], dtype=float),
+            "fills": np.array([s.fills for s in stats], dtype=np.int64),
+            "realized_profit": np.array([s.realized_profit for s in stats], dtype=float),
+            "commission": np.array([s.commission for s in stats], dtype=float),
+            "closed_positions": np.array([s.closed for s in stats], dtype=np.int64),
+            "average_holding_time": np.array([s.average_holding_time() for s in stats], dtype=float),
+            "open_volume": np.array([s.open_volume for s in stats], dtype=float),
+        }
+
+    def export_csv(self, path):
+        with open(path, "w", newline="") as output:
+            writer = csv.DictWriter(output, fieldnames=LEDGER_COLUMNS)
+            writer.writeheader()
+            writer.writerows(self.rows())
+
+    def clear(self):
+        self.levels.clear()
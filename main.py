@@ -1,17 +1,326 @@
+import argparse
 import sys
-from PyQt5 import QtWidgets
-from graph import MarketGraph
-from trading import TradingSimulator
-from menu import MainWindow
 
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Grid trading simulator")
+    parser.add_argument("--headless", action="store_true", help="run the engine without the GUI")
+    parser.add_argument("--ticks", type=int, default=100000, help="number of ticks for a headless run")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for the price generator")
+    parser.add_argument("--price", type=float, default=100.0, help="initial price")
+    parser.add_argument("--volatility", type=float, default=0.001, help="per-tick volatility")
+    parser.add_argument("--balance", type=float, default=10000.0, help="initial balance")
+    parser.add_argument("--grid-step", type=float, default=0.8, help="grid step in percent")
+    parser.add_argument(
+        "--tick-size", type=float, default=0.0, help="store prices as integer ticks of this size (0 disables)"
+    )
+    parser.add_argument("--lot-size", type=float, default=0.0001, help="lot size for --tick-size mode")
+    parser.add_argument(
+        "--allocation", default="proportional", choices=["proportional", "near_first", "equal_risk"],
+        help="how grid volumes are trimmed when free margin runs out",
+    )
+    parser.add_argument(
+        "--strategy-batch", type=int, default=0, help="call the strategy once per N ticks (0 - every tick)"
+    )
+    parser.add_argument(
+        "--distribution-bins", type=int, default=50, help="histogram bins of the price distribution chart"
+    )
+    parser.add_argument(
+        "--depth-levels", type=int, default=0, help="record an order-book depth heatmap with N price levels (0 disables)"
+    )
+    parser.add_argument("--bars", type=int, default=0, help="run in bar mode with N ticks per bar")
+    parser.add_argument(
+        "--compare-bars", action="store_true", help="compare bar mode (--bars) against tick mode"
+    )
+    parser.add_argument(
+        "--risk-interval", type=int, default=0, help="run forward risk projection every N ticks (0 disables)"
+    )
+    parser.add_argument("--feed", default=None, help="paper-trade against a live tick feed at HOST:PORT")
+    parser.add_argument(
+        "--serve-feed", type=int, default=0, help="serve --ticks generated prices as a local feed on PORT"
+    )
+    parser.add_argument("--feed-rate", type=float, default=None, help="ticks per second for --serve-feed")
+    parser.add_argument(
+        "--drop-policy", default="block", choices=["block", "drop_newest", "drop_oldest"],
+        help="what to do when the feed queue is full",
+    )
+    parser.add_argument("--batch-size", type=int, default=256, help="maximum ticks per engine batch")
+    parser.add_argument(
+        "--batch-mode", default="ticks", choices=["ticks", "bar"],
+        help="feed ticks one by one or as OHLC bars of --bars ticks (or --bar-seconds)",
+    )
+    parser.add_argument(
+        "--bar-seconds", type=float, default=0.0, help="build feed bars by feed timestamp instead of tick count"
+    )
+    parser.add_argument(
+        "--variants", default=None,
+        help='JSON list of parameter overrides run in lockstep, e.g. \'[{"grid_step_percent": 0.5}, {}]\'',
+    )
+    parser.add_argument("--ledger", default=None, help="export per-level trade statistics to this CSV file")
+    parser.add_argument("--ledger-level", type=float, default=0.01, help="price quantum of ledger levels")
+    parser.add_argument("--journal", default=None, help="write a binary journal of engine events to this file")
+    parser.add_argument(
+        "--diff-journals", nargs=2, metavar=("LEFT", "RIGHT"), default=None,
+        help="compare two journals and report the first divergence",
+    )
+    parser.add_argument(
+        "--diff-tolerance", type=float, default=0.0, help="absolute tolerance for prices and volumes in --diff-journals"
+    )
+    parser.add_argument("--publish", default=None, help="publish live engine state to this shared-memory name")
+    parser.add_argument("--publish-interval", type=int, default=1000, help="ticks between published states")
+    parser.add_argument(
+        "--publish-unlink", action="store_true",
+        help="remove the published segment when the run ends instead of leaving it for late viewers",
+    )
+    parser.add_argument("--dashboard", default=None, help="show a terminal dashboard of a --publish run")
+    parser.add_argument("--view", default=None, help="show a --publish run in the chart and positions windows")
+    parser.add_argument(
+        "--unlink", action="store_true", help="remove the segment of a finished run when --dashboard/--view exits"
+    )
+    parser.add_argument("--record", default=None, help="save the headless run to an .npz recording")
+    parser.add_argument("--frame-stride", type=int, default=1000, help="ticks between recorded frames")
+    parser.add_argument("--render", default=None, help="render a recording offscreen (see --output)")
+    parser.add_argument("--output", default="frames", help="PNG directory or video file for --render")
+    parser.add_argument("--workers", type=int, default=None, help="render worker processes")
+    parser.add_argument("--soak", action="store_true", help="run a long soak test with memory tracking")
+    parser.add_argument("--sample-interval", type=int, default=1000000, help="ticks between soak samples")
+    parser.add_argument("--max-growth-mb", type=float, default=256.0, help="allowed memory growth after warmup")
+    parser.add_argument("--tracemalloc", action="store_true", help="record tracemalloc snapshots in a soak run")
+    parser.add_argument(
+        "--trace-every", type=int, default=1, help="soak samples between tracemalloc snapshots with --tracemalloc"
+    )
+    return parser.parse_args(argv)
+
+
+def engine_options(args):
+    options = {
+        "initial_price": args.price,
+        "volatility": args.volatility,
+        "initial_balance": args.balance,
+        "grid_step_percent": args.grid_step,
+        "allocation_policy": args.allocation,
+        "num_bins": max(2, args.distribution_bins),
+    }
+    if args.tick_size > 0:
+        from instrument import InstrumentSpec
+
+        options["instrument"] = InstrumentSpec(args.tick_size, args.lot_size)
+    return options
+
+
+def build_engine(args):
+    # Импорт движка только здесь: безголовый запуск не тянет Qt и pyqtgraph
+    from engine import SimulationEngine
+
+    engine = SimulationEngine(seed=args.seed, **engine_options(args))
+    if args.depth_levels > 0:
+        engine.attach_depth_buffer(num_levels=args.depth_levels)
+    return engine
+
+
+def print_report(report):
+    for key, value in report.items():
+        print(f"{key}: {value}")
+
+
+def run_bar_comparison(args):
+    from engine import compare_bar_and_tick_modes
+
+    results = compare_bar_and_tick_modes(
+        args.ticks, args.bars, seed=args.seed, **engine_options(args)
+    )
+    for mode in ("tick", "bar"):
+        print(f"[{mode} mode]")
+        print_report(results[mode])
+    print("[bar - tick]")
+    print_report(results["delta"])
+    print(f"speedup: {results['speedup']:.1f}x")
+    return 0
+
+
+def run_feed_server(args):
+    import asyncio
+    from feed import start_replay_server
+
+    prices = build_engine(args).generate_prices(args.ticks)
+
+    async def serve():
+        server = await start_replay_server(prices, port=args.serve_feed, rate=args.feed_rate)
+        print(f"Serving {len(prices)} ticks on port {args.serve_feed}")
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(serve())
+    return 0
+
+
+def run_feed(args):
+    from feed import run_live_feed
+
+    host, _, port = args.feed.rpartition(":")
+    engine = build_engine(args)
+    stats = run_live_feed(
+        engine,
+        host or "127.0.0.1",
+        int(port),
+        batch_size=args.batch_size,
+        drop_policy=args.drop_policy,
+        batch_mode=args.batch_mode,
+        bar_timeframe=args.bar_seconds or args.bars or None,
+        bar_by_time=args.bar_seconds > 0,
+    )
+    print_report(engine.get_report())
+    print_report(stats)
+    return 0
+
+
+def run_soak_test(args):
+    from soak import format_soak_report, run_soak
+
+    result = run_soak(
+        args.ticks,
+        seed=args.seed if args.seed is not None else 0,
+        sample_interval=args.sample_interval,
+        max_growth_mb=args.max_growth_mb,
+        trace=args.tracemalloc,
+        trace_every=max(1, args.trace_every),
+        **engine_options(args),
+    )
+    print(format_soak_report(result))
+    return 0 if result["passed"] else 1
+
+
+def run_variants(args):
+    import json
+    from engine import LockstepEngine
+
+    options = engine_options(args)
+    defaults = {
+        "grid_step_percent": options.pop("grid_step_percent"),
+        "allocation_policy": options.pop("allocation_policy"),
+        "num_bins": options.pop("num_bins"),
+    }
+    variants = [{**defaults, **variant} for variant in json.loads(args.variants)]
+    engine = LockstepEngine(variants, seed=args.seed, **options)
+    for result in engine.run(args.ticks):
+        print(f"[{result.pop('variant')}]")
+        print_report(result)
+    return 0
+
+
+def run_headless(args):
+    if args.variants:
+        return run_variants(args)
+    if args.soak:
+        return run_soak_test(args)
+    if args.serve_feed:
+        return run_feed_server(args)
+    if args.feed:
+        return run_feed(args)
+    if args.compare_bars:
+        if args.bars <= 0:
+            print("--compare-bars requires --bars N")
+            return 2
+        return run_bar_comparison(args)
+
+    engine = build_engine(args)
+    if args.record:
+        engine.attach_recorder(args.frame_stride)
+    if args.ledger:
+        engine.attach_ledger(args.ledger_level)
+    if args.journal:
+        engine.attach_journal(args.journal)
+    if args.publish:
+        engine.attach_publisher(args.publish, interval=args.publish_interval, unlink=args.publish_unlink)
+    if args.risk_interval > 0:
+        engine.attach_risk_worker(interval=args.risk_interval, seed=args.seed)
+    if args.bars > 0:
+        engine.run_bars(args.ticks, args.bars)
+    elif args.strategy_batch > 0:
+        engine.run_batches(args.ticks, args.strategy_batch)
+    else:
+        engine.run(args.ticks)
+    engine.close()
+    if args.record:
+        engine.recorder.save(args.record)
+    if args.ledger:
+        engine.order_manager.ledger.export_csv(args.ledger)
+    print_report(engine.get_report())
+    return 0
+
+
+def run_gui(args):
+    from PyQt5 import QtWidgets
+    from menu import MainWindow
+
     app = QtWidgets.QApplication([])
 
-    main_window = MainWindow()
+    main_window = MainWindow(depth_levels=args.depth_levels or 200, distribution_bins=args.distribution_bins)
     main_window.show()
 
-    sys.exit(app.exec_())
+    return app.exec_()
+
+
+def run_render(args):
+    from render import render_recording
+
+    rendered = render_recording(args.render, args.output, workers=args.workers)
+    print(f"Rendered {rendered} frames to {args.output}")
+    return 0
+
+
+def run_journal_diff(args):
+    from journal import diff_journals, format_journal_diff
+
+    diff = diff_journals(*args.diff_journals, tolerance=args.diff_tolerance)
+    print(format_journal_diff(diff))
+    return 0 if diff["first_divergence"] is None else 1
+
+
+def run_state_dashboard(args):
+    from publisher import run_dashboard
+
+    return run_dashboard(args.dashboard, unlink=args.unlink)
+
+
+def run_state_viewer(args):
+    from PyQt5 import QtWidgets
+    from graph import MarketGraph
+    from positions_window import PositionsWindow
+    from publisher import StateReader
+
+    app = QtWidgets.QApplication([])
+
+    reader = StateReader(args.view)
+    graph = MarketGraph()
+    graph.setWindowTitle(f"Published state: {args.view}")
+    positions_window = PositionsWindow()
+    graph.set_positions_window(positions_window)
+    graph.attach_state_reader(reader)
+    graph.show()
+    positions_window.show()
+
+    try:
+        return app.exec_()
+    finally:
+        graph.state_timer.stop()
+        reader.close(unlink=args.unlink and reader.finished)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.dashboard:
+        return run_state_dashboard(args)
+    if args.view:
+        return run_state_viewer(args)
+    if args.diff_journals:
+        return run_journal_diff(args)
+    if args.render:
+        return run_render(args)
+    if args.headless:
+        return run_headless(args)
+    return run_gui(args)
+
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
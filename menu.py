@@ -1,4 +1,5 @@
 from PyQt5 import QtWidgets, QtGui
+from depth import DepthBuffer
 from graph import MarketGraph
 from trading import TradingSimulator
 
@@ -22,6 +23,12 @@ class GridSettingsDialog(QtWidgets.QDialog):
         layout.addWidget(self.volatility_label)
         layout.addWidget(self.volatility_input)
 
+        self.distribution_bins_label = QtWidgets.QLabel("Distribution Bins:")
+        self.distribution_bins_input = QtWidgets.QLineEdit()
+        self.distribution_bins_input.setValidator(QtGui.QIntValidator(2, 1000))
+        layout.addWidget(self.distribution_bins_label)
+        layout.addWidget(self.distribution_bins_input)
+
         self.apply_button = QtWidgets.QPushButton("Apply")
         self.apply_button.clicked.connect(self.accept)
         layout.addWidget(self.apply_button)
@@ -29,11 +36,15 @@ class GridSettingsDialog(QtWidgets.QDialog):
         self.setLayout(layout)
 
     def get_settings(self):
-        return {"grid_size": float(self.grid_size_input.text()), "volatility": float(self.volatility_input.text())}
+        return {
+            "grid_size": float(self.grid_size_input.text()),
+            "volatility": float(self.volatility_input.text()),
+            "distribution_bins": int(self.distribution_bins_input.text() or 0),
+        }
 
 
 class MainWindow(QtWidgets.QMainWindow):
-    def __init__(self):
+    def __init__(self, depth_levels=200, distribution_bins=50):
         super().__init__()
         self.setWindowTitle("Trading Simulator")
         self.setGeometry(100, 100, 1200, 800)
@@ -42,11 +53,37 @@ class MainWindow(QtWidgets.QMainWindow):
         self.setCentralWidget(self.graph)
 
         self.simulator = TradingSimulator(self.graph)
+        self.attach_depth_buffer(depth_levels)
+        self.set_distribution_bins(distribution_bins)
 
         self.init_menu()
         self.init_toolbar()
         self.show()
 
+    def attach_depth_buffer(self, num_levels):
+        # Тепловая карта стакана: буфер заполняет OrderManager симулятора
+        engine = getattr(self.simulator, "engine", None)
+        if hasattr(engine, "attach_depth_buffer"):
+            engine.attach_depth_buffer(num_levels=num_levels)
+            self.graph.set_depth_buffer(engine.order_manager.depth_buffer)
+            return
+        order_manager = getattr(self.simulator, "order_manager", None)
+        if order_manager is not None:
+            price = order_manager.current_price or getattr(self.simulator, "initial_price", 100.0)
+            order_manager.depth_buffer = DepthBuffer.around(price, num_levels=num_levels)
+            order_manager.book_changed = True
+            self.graph.set_depth_buffer(order_manager.depth_buffer)
+
+    def set_distribution_bins(self, num_bins):
+        order_manager = getattr(self.simulator, "order_manager", None)
+        if order_manager is not None:
+            order_manager.set_distribution_bins(num_bins)
+            # Гистограмма пересчитывается сразу, не дожидаясь следующего тика
+            distribution_data = order_manager.get_price_distribution_data()
+            if distribution_data is not None:
+                self.graph.distribution_data = distribution_data
+                self.graph.update_distribution_chart()
+
     def init_toolbar(self):
         toolbar = self.addToolBar("Controls")
 
@@ -80,8 +117,14 @@ class MainWindow(QtWidgets.QMainWindow):
 
     def open_grid_settings(self):
         dialog = GridSettingsDialog(self)
+        order_manager = getattr(self.simulator, "order_manager", None)
+        if order_manager is not None:
+            dialog.distribution_bins_input.setText(str(order_manager.num_bins))
         if dialog.exec_() == QtWidgets.QDialog.Accepted:
             settings = dialog.get_settings()
+            distribution_bins = settings.pop("distribution_bins")
+            if distribution_bins:
+                self.set_distribution_bins(distribution_bins)
             self.simulator.set_grid_settings(settings)
 
     def closeEvent(self, event):
@@ -1,11 +1,45 @@
 import uuid
 import numpy as np
-from scipy import stats
+
+from allocation import allocate_margin
+from bars import intrabar_path
+from strategy import GridStrategy
+
+
+SQRT_2PI = np.sqrt(2 * np.pi)
+
+
+def normal_pdf(x, mean, std):
+    # Плотность нормального распределения в замкнутой форме (без SciPy)
+    if std <= 0:
+        return np.zeros_like(np.asarray(x, dtype=float))
+    z = (np.asarray(x, dtype=float) - mean) / std
+    return np.exp(-0.5 * z * z) / (std * SQRT_2PI)
 
 
 class Position:
-    def __init__(self, order_type, price, volume, commission_rate=0.00016):
+    def __init__(
+        self,
+        order_type,
+        price,
+        volume,
+        commission_rate=0.00016,
+        instrument=None,
+        position_id=None,
+        entry_time=None,
+        ledger=None,
+    ):
+        self.id = position_id if position_id is not None else str(uuid.uuid4())[:8]
         self.order_type = order_type
+        self.entry_time = entry_time
+        self.ledger = ledger
+        self.instrument = instrument
+        if instrument is not None:
+            # Целочисленный режим: вход в тиках, объем в лотах
+            self.entry_ticks = instrument.to_ticks(price)
+            self.volume_lots = instrument.to_lots(volume)
+            price = instrument.to_price(self.entry_ticks)
+            volume = instrument.to_volume(self.volume_lots)
         self.entry_price = price
         self.volume = volume
         self.floating_profit = 0
@@ -14,16 +48,28 @@ class Position:
         self.profit = 0
         self.commission = price * volume * commission_rate
 
+    def _profit_units(self, price):
+        # P&L в целых единицах "тик * лот"
+        ticks = self.instrument.to_ticks(price) - self.entry_ticks
+        if self.order_type != "buy":
+            ticks = -ticks
+        return ticks * self.volume_lots
+
     def update_floating_profit(self, current_price):
-        if self.order_type == "buy":
+        if self.instrument is not None:
+            self.floating_profit = self.instrument.pnl(self._profit_units(current_price))
+        elif self.order_type == "buy":
             self.floating_profit = (current_price - self.entry_price) * self.volume
         else:  # sell
             self.floating_profit = (self.entry_price - current_price) * self.volume
         return self.floating_profit
 
-    def close_position(self, exit_price):
+    def close_position(self, exit_price, exit_time=None):
         self.exit_price = exit_price
-        if self.order_type == "buy":
+        if self.instrument is not None:
+            self.profit_units = self._profit_units(exit_price)
+            self.profit = self.instrument.pnl(self.profit_units) - self.commission
+        elif self.order_type == "buy":
             self.profit = (
                 exit_price - self.entry_price
             ) * self.volume - self.commission
@@ -32,21 +78,38 @@ class Position:
                 self.entry_price - exit_price
             ) * self.volume - self.commission
         self.closed = True
+        if self.ledger is not None:
+            self.ledger.record_close(self, exit_time)
         return self.profit
 
 
 class Order:
-    def __init__(self, order_type, price, volume, commission_rate):
-        self.id = str(uuid.uuid4())[:8]
+    def __init__(
+        self, order_type, price, volume, commission_rate, instrument=None, order_id=None
+    ):
+        self.id = order_id if order_id is not None else str(uuid.uuid4())[:8]
         self.order_type = order_type
-        self.price = price
-        self.volume = volume
+        self.instrument = instrument
+        self.set_price(price)
+        self.set_volume(volume)
         self.executed = False
         self.execution_price = None
         self.profit = 0
         self.commission_rate = commission_rate
         self.commission = 0  # Будет рассчитано при исполнении ордера
 
+    def set_price(self, price):
+        if self.instrument is not None:
+            self.price_ticks = self.instrument.to_ticks(price)
+            price = self.instrument.to_price(self.price_ticks)
+        self.price = price
+
+    def set_volume(self, volume):
+        if self.instrument is not None:
+            self.volume_lots = self.instrument.to_lots(volume)
+            volume = self.instrument.to_volume(self.volume_lots)
+        self.volume = volume
+
 
 class OrderManager:
     def __init__(
@@ -59,6 +122,10 @@ class OrderManager:
         min_grid_coverage=0.05,
         min_orders=2,
         max_orders=6,
+        num_bins=50,
+        instrument=None,
+        strategy=None,
+        allocation_policy="proportional",
     ):
         # ... (оставьте существующую инициализацию)
         self.initial_balance = initial_balance
@@ -84,7 +151,7 @@ class OrderManager:
         self.executed_orders_history = []
         self.price_distribution = []
         self.distribution_period = 1000  # Количество последних цен для анализа
-        self.num_bins = 50  # Количество столбиков в гистограмме
+        self.num_bins = num_bins  # Количество столбиков в гистограмме
         self.volume_growth_factor = 1.2  # Коэффициент роста объема ордеров
         self.price_frequency = {}
         # Новые атрибуты для динамического шага сетки
@@ -94,6 +161,35 @@ class OrderManager:
         self.max_grid_step_multiplier = 8  # Максимальное увеличение шага сетки
         self.total_profit = 0
         self.total_commission = 0
+        # Тепловая карта стакана (см. depth.DepthBuffer), подключается опционально
+        self.depth_buffer = None
+        self.book_changed = True
+        # Целочисленный режим (см. instrument.InstrumentSpec): цены в тиках, объемы в лотах
+        self.instrument = instrument
+        self.realized_units = 0  # Сумма P&L закрытых позиций в "тик * лот" (без комиссий)
+        # В режиме lockstep (engine.LockstepEngine) распределение цен и экстремумы истории
+        # общие для всех вариантов и обновляются движком один раз на тик
+        self.track_distribution = True
+        self.price_extremes = None
+        # Подписчики на события движка (timeline.Timeline и т.п.): callback(tick, kind, fields).
+        # Идентификаторы ордеров и позиций последовательные, чтобы прогоны были воспроизводимы
+        self.event_listeners = []
+        # Статистика по ценовым уровням (см. ledger.TradeLedger), подключается опционально
+        self.ledger = None
+        self.next_order_id = 1
+        self.next_position_id = 1
+        # Логика сетки вынесена в стратегию (см. strategy.Strategy), по умолчанию - GridStrategy
+        self.strategy = strategy if strategy is not None else GridStrategy()
+        self.strategy.bind(self)
+        # Распределение маржи при перестройке сетки (см. allocation.allocate_margin)
+        self.allocation_policy = allocation_policy
+        self.last_allocation = None
+
+    def emit_event(self, kind, **fields):
+        if self.event_listeners:
+            tick = len(self.price_history) - 1
+            for listener in self.event_listeners:
+                listener(tick, kind, fields)
 
     def update_price_distribution(self, price):
         self.price_distribution.append(price)
@@ -101,38 +197,60 @@ class OrderManager:
             self.price_distribution.pop(0)
 
         # Обновляем частоту цен
-        price_bin = round(price, 4)  # Округляем до двух знаков после запятой
+        if self.instrument is not None:
+            price_bin = self.instrument.to_ticks(price)
+        else:
+            price_bin = round(price, 4)  # Округляем до двух знаков после запятой
         self.price_frequency[price_bin] = self.price_frequency.get(price_bin, 0) + 1
 
+    def update_price_distribution_many(self, prices):
+        # То же, что update_price_distribution для каждой цены, но одним вызовом на блок
+        if not len(prices):
+            return
+        self.price_distribution.extend(prices.tolist())
+        del self.price_distribution[: -self.distribution_period]
+        if self.instrument is not None:
+            price_bins = self.instrument.ticks_array(prices)
+        else:
+            price_bins = np.round(prices, 4)
+        keys, counts = np.unique(price_bins, return_counts=True)
+        frequency = self.price_frequency
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            frequency[key] = frequency.get(key, 0) + count
+
     def get_price_distribution_data(self):
         if len(self.price_distribution) < 2:
             return None
 
-        mean = np.mean(self.price_distribution)
-        std = np.std(self.price_distribution)
-        hist, bin_edges = np.histogram(
-            self.price_distribution, bins=self.num_bins, density=True
-        )
+        prices = np.asarray(self.price_distribution, dtype=float)
+        mean = prices.mean()
+        std = prices.std()
+        hist, bin_edges = np.histogram(prices, bins=self.num_bins, density=True)
 
         # Вычисляем нормальное распределение для сравнения
-        x = np.linspace(min(self.price_distribution), max(self.price_distribution), 100)
-        normal_dist = stats.norm.pdf(x, mean, std)
+        x = np.linspace(prices.min(), prices.max(), 100)
+        normal_dist = normal_pdf(x, mean, std)
 
         # Находим максимальное значение плотности вероятности
-        max_density = max(max(hist), max(normal_dist))
+        max_density = max(hist.max(), normal_dist.max())
 
         # Нормализуем гистограмму и нормальное распределение
-        hist_normalized = hist / max_density
-        normal_dist_normalized = normal_dist / max_density
+        if max_density > 0:
+            hist = hist / max_density
+            normal_dist = normal_dist / max_density
 
+        # Отдаём массивы NumPy: график обновляет свои элементы без копирования в списки
         return {
-            "hist": hist_normalized.tolist(),
-            "bin_edges": bin_edges.tolist(),
-            "normal_dist": normal_dist_normalized.tolist(),
-            "x": x.tolist(),
+            "hist": hist,
+            "bin_edges": bin_edges,
+            "normal_dist": normal_dist,
+            "x": x,
             "current_price": self.current_price,
         }
 
+    def set_distribution_bins(self, num_bins):
+        self.num_bins = max(2, int(num_bins))
+
     def calculate_distribution_coefficient(self):
         if len(self.executed_orders_history) < self.distribution_period:
             return 1.0  # Возвращаем нейтральный коэффициент, если недостаточно данных
@@ -148,7 +266,10 @@ class OrderManager:
         if not self.price_frequency:
             return 1.0
 
-        price_bin = round(price, 2)
+        if self.instrument is not None:
+            price_bin = self.instrument.to_ticks(price)
+        else:
+            price_bin = round(price, 2)
         frequency = self.price_frequency.get(price_bin, 0)
         max_frequency = max(self.price_frequency.values())
 
@@ -159,8 +280,11 @@ class OrderManager:
         return 1 + (1 - frequency / max_frequency)
 
     def calculate_grid_boundaries(self, ema, price_history):
-        hist_min = np.min(price_history)
-        hist_max = np.max(price_history)
+        if self.price_extremes is not None:
+            hist_min, hist_max = self.price_extremes
+        else:
+            hist_min = np.min(price_history)
+            hist_max = np.max(price_history)
         current_price = price_history[-1]
 
         # Рассчитываем минимальный шаг сетки
@@ -222,32 +346,20 @@ class OrderManager:
         sell_step,
         num_levels=10,
     ):
-        buy_range = ema - lower_bound
-        sell_range = upper_bound - ema
-
-        buy_levels = int(num_levels * (buy_range / (buy_range + sell_range)))
-        sell_levels = num_levels - buy_levels
-
-        buy_prices = np.linspace(lower_bound, min(ema, current_price), buy_levels + 1)[
-            :-1
-        ]
-        sell_prices = np.linspace(
-            max(ema, current_price), upper_bound, sell_levels + 1
-        )[1:]
-
-        # Применяем динамический шаг к ценам
-        buy_prices = [
-            current_price * (1 - (i + 1) * buy_step / 100) for i in range(buy_levels)
-        ]
-        sell_prices = [
-            current_price * (1 + (i + 1) * sell_step / 100) for i in range(sell_levels)
-        ]
-
-        return buy_prices, sell_prices
+        return self.strategy.create_asymmetric_grid(
+            ema, current_price, lower_bound, upper_bound, buy_step, sell_step, num_levels
+        )
 
     def place_order(self, order_type, price, volume):
         # print(f"Attempting to place order: Type={order_type}, Price={price}, Volume={volume}")
 
+        if self.instrument is not None:
+            # Квантуем до проверок, чтобы маржа и сторона считались по реальному ордеру
+            price = self.instrument.round_price(price)
+            volume = self.instrument.to_volume(self.instrument.to_lots(volume))
+            if volume <= 0:
+                return False
+
         if (order_type == "buy" and price >= self.current_price) or (
             order_type == "sell" and price <= self.current_price
         ):
@@ -261,9 +373,7 @@ class OrderManager:
         # )
 
         if price > 0 and self.free_margin >= required_margin + estimated_commission:
-            order = Order(order_type, price, volume, self.commission_rate)
-            self.orders.append(order)
-            self.free_margin -= required_margin + estimated_commission
+            self.open_order(order_type, price, volume)
             # print(
             # f"Placed {order_type} order at {price} for {volume} units. Estimated commission: {estimated_commission:.8f}"
             # )
@@ -272,43 +382,65 @@ class OrderManager:
             # print(f"Insufficient margin to place {order_type} order at {price} for {volume} units.")
             return False
 
-    def update_grid(self, ema, current_price, price_history):
-        lower_bound, upper_bound = self.calculate_grid_boundaries(ema, price_history)
-
-        # Рассчитываем динамические шаги сетки для покупок и продаж
-        buy_step = self.calculate_dynamic_grid_step("buy")
-        sell_step = self.calculate_dynamic_grid_step("sell")
-
-        # Генерируем цены для покупки и продажи с учетом динамических шагов
-        buy_prices, sell_prices = self.create_asymmetric_grid(
-            ema, current_price, lower_bound, upper_bound, buy_step, sell_step
+    def open_order(self, order_type, price, volume):
+        # Выставление без проверок: цена, сторона и маржа уже проверены вызывающим
+        order = Order(
+            order_type,
+            price,
+            volume,
+            self.commission_rate,
+            self.instrument,
+            order_id=self.next_order_id,
         )
+        self.next_order_id += 1
+        self.orders.append(order)
+        self.free_margin -= price * volume + price * volume * self.commission_rate
+        self.book_changed = True
+        self.emit_event(
+            "order_placed",
+            id=order.id,
+            side=order.order_type,
+            price=order.price,
+            volume=order.volume,
+        )
+        return order
 
-        base_volume = self.calculate_base_volume(current_price)
-
-        # Удалим существующие неисполненные ордера
+    def update_grid(self, ema, current_price, price_history):
+        self.apply_intents([self.strategy.build_grid(ema, current_price, price_history)])
+
+    def apply_intents(self, intents):
+        for intent in intents:
+            if intent is None:
+                continue
+            if intent.action == "rebuild_grid":
+                self.rebuild_grid(intent)
+            elif intent.action == "place":
+                self.place_order(intent.side, intent.price, intent.volume)
+            elif intent.action == "cancel_all":
+                self.cancel_resting_orders()
+            else:
+                raise ValueError(f"Unknown order intent: {intent.action}")
+
+    def cancel_resting_orders(self):
+        if self.event_listeners:
+            for order in self.orders:
+                if not order.executed:
+                    self.emit_event("order_cancelled", id=order.id)
         self.orders = [order for order in self.orders if order.executed]
+        self.book_changed = True
 
-        # Размещаем новые ордера
-        for i, price in enumerate(buy_prices):
-            volume = base_volume * (self.volume_growth_factor**i)
-            self.place_order("buy", price, volume)
+    def rebuild_grid(self, intent):
+        ema = intent.ema
+        current_price = intent.price
+        price_history = self.price_history
 
-        for i, price in enumerate(sell_prices):
-            volume = base_volume * (self.volume_growth_factor**i)
-            self.place_order("sell", price, volume)
-
-        # Проверяем, достаточно ли свободной маржи
-        total_margin_required = sum(
-            [order.price * order.volume for order in self.orders if not order.executed]
-        )
+        # Удалим существующие неисполненные ордера
+        self.cancel_resting_orders()
+        self.emit_event("grid_rebuilt", ema=ema, price=current_price)
 
-        # Add this check to avoid division by zero
-        if total_margin_required > 0 and total_margin_required > self.free_margin:
-            volume_adjustment = self.free_margin / total_margin_required
-            for order in self.orders:
-                if not order.executed:
-                    order.volume *= volume_adjustment
+        # Размещаем новые ордера: маржа распределяется по всей сетке одной проверкой,
+        # поэтому результат не зависит от порядка выставления уровней
+        self.allocate_grid_orders(intent)
 
         # Обновляем график
         buy_orders = [
@@ -334,10 +466,46 @@ class OrderManager:
             )
             if hasattr(self.graph, "update_visible_range"):
                 self.graph.update_visible_range(self.graph.data_offset)
-        else:
+        elif self.graph is not None:
             # Fallback to old update method if set_full_data is not available
             self.graph.update_orders(self.orders)
 
+    def allocate_grid_orders(self, intent):
+        buy_prices = np.asarray(intent.buy_prices, dtype=float)
+        prices = np.concatenate([buy_prices, np.asarray(intent.sell_prices, dtype=float)])
+        volumes = np.concatenate(
+            [np.asarray(intent.buy_volumes, dtype=float), np.asarray(intent.sell_volumes, dtype=float)]
+        )
+        is_buy = np.arange(len(prices)) < len(buy_prices)
+        if self.instrument is not None:
+            prices = self.instrument.round_prices(prices)
+            volumes = self.instrument.round_volumes(volumes)
+
+        current_price = self.current_price
+        valid = (
+            np.where(is_buy, prices < current_price, prices > current_price)
+            & (prices > 0)
+            & (volumes > 0)
+        )
+        prices, volumes, is_buy = prices[valid], volumes[valid], is_buy[valid]
+        allocation = allocate_margin(
+            prices,
+            volumes,
+            np.abs(prices - current_price),
+            self.free_margin,
+            self.commission_rate,
+            self.allocation_policy,
+        )
+        self.last_allocation = allocation.report()
+
+        allocated = allocation.volumes
+        if self.instrument is not None:
+            # Округление вниз до лота не увеличивает распределенную маржу
+            allocated = self.instrument.round_volumes(allocated)
+        for price, volume, buy in zip(prices.tolist(), allocated.tolist(), is_buy.tolist()):
+            if volume > 0:
+                self.open_order("buy" if buy else "sell", price, volume)
+
     def update_existing_orders(self, ema, current_price):
         for order in self.orders:
             if not order.executed:
@@ -345,19 +513,21 @@ class OrderManager:
                     new_price = min(
                         order.price, ema * (1 - self.grid_step_percent / 100)
                     )
-                    order.price = new_price
+                    order.set_price(new_price)
+                    self.emit_event("order_moved", id=order.id, price=order.price)
+                    self.book_changed = True
                     # print(f"Updated buy order {order.id} price to {new_price}")
                 elif order.order_type == "sell" and order.price < current_price:
                     new_price = max(
                         order.price, ema * (1 + self.grid_step_percent / 100)
                     )
-                    order.price = new_price
+                    order.set_price(new_price)
+                    self.emit_event("order_moved", id=order.id, price=order.price)
+                    self.book_changed = True
                     # print(f"Updated sell order {order.id} price to {new_price}")
 
     def calculate_base_volume(self, current_price):
-        return (
-            self.free_margin * 0.01 / current_price
-        )  # Используем 1% свободной маржи для базового объема
+        return self.strategy.calculate_base_volume(current_price)
 
     def calculate_order_volume(self, current_price):
         # Рассчитываем общий объем для всей сетки
@@ -372,29 +542,48 @@ class OrderManager:
 
         return volume_per_level
 
-    def check_orders(self, current_price):
+    def check_orders(self, current_price, last_price=None):
+        self.process_fills(current_price, last_price)
+
+        # Проверяем, нужно ли обновить сетку
+        self.apply_intents(
+            self.strategy.on_tick(current_price, len(self.price_history) - 1)
+        )
+
+        self.record_depth()
+
+    def process_fills(self, current_price, last_price=None):
         self.current_price = current_price
         self.calculate_floating_profit(current_price)
         self.calculate_free_margin()
-        self.update_price_distribution(current_price)
+        if self.track_distribution:
+            self.update_price_distribution(current_price)
         # print(f"Checking orders at current price: {current_price}")
 
-        last_price = (
-            self.price_history[-2]
-            if len(self.price_history) > 1
-            else self.current_price
-        )
+        if last_price is None:
+            last_price = (
+                self.price_history[-2]
+                if len(self.price_history) > 1
+                else self.current_price
+            )
         price_range = sorted([last_price, current_price])
+        price_key = "price"
+        if self.instrument is not None:
+            # Сравнение целых тиков вместо float-цен: без ошибок округления на границах
+            price_range = [self.instrument.to_ticks(price) for price in price_range]
+            price_key = "price_ticks"
 
         orders_executed = False
         for order in self.orders[:]:  # Используем копию списка
-            if not order.executed:
+            # Ордер мог быть снят перестроением сетки после предыдущего исполнения
+            if not order.executed and order in self.orders:
+                order_price = getattr(order, price_key)
                 if (
                     order.order_type == "buy"
-                    and price_range[0] <= order.price <= price_range[1]
+                    and price_range[0] <= order_price <= price_range[1]
                 ) or (
                     order.order_type == "sell"
-                    and price_range[0] <= order.price <= price_range[1]
+                    and price_range[0] <= order_price <= price_range[1]
                 ):
                     # print(f"Executing order: {order.id}")
                     self.execute_order(order, order.price)
@@ -403,34 +592,57 @@ class OrderManager:
         if orders_executed:
             self.update_display()
 
-        # Проверяем, нужно ли обновить сетку
-        buy_orders = [
-            order
-            for order in self.orders
-            if order.order_type == "buy" and not order.executed
-        ]
-        sell_orders = [
-            order
-            for order in self.orders
-            if order.order_type == "sell" and not order.executed
-        ]
-        total_orders = len(buy_orders) + len(sell_orders)
-
-        should_update_grid = False
-
-        if total_orders == 0:
-            # print("No open orders. Initializing grid.")
-            should_update_grid = True
-        elif total_orders > 0:
-            if (
-                len(buy_orders) <= total_orders * 0.2
-                or len(sell_orders) <= total_orders * 0.2
-            ):
-                # print("Low order count on one side. Updating grid.")
-                should_update_grid = True
+    def first_crossing(self, lows, highs):
+        # Номер первого тика, диапазон которого [low, high] задевает стоящий ордер
+        # (то же условие, что в process_fills); len(lows), если таких нет
+        if self.instrument is not None:
+            levels = [order.price_ticks for order in self.orders if not order.executed]
+            lows = self.instrument.ticks_array(lows)
+            highs = self.instrument.ticks_array(highs)
+        else:
+            levels = [order.price for order in self.orders if not order.executed]
+        if not levels:
+            return len(lows)
+        levels = np.sort(np.asarray(levels))
+        crossed = np.searchsorted(levels, highs, side="right") > np.searchsorted(levels, lows, side="left")
+        return int(np.argmax(crossed)) if crossed.any() else len(lows)
+
+    def check_bar(self, open_price, high, low, close):
+        # Режим баров: исполнение по диапазону high/low вдоль детерминированного пути
+        # "прошлое закрытие -> open -> low/high -> high/low -> close".
+        # В price_history уже должно лежать закрытие текущего бара.
+        previous_close = (
+            self.price_history[-2] if len(self.price_history) > 1 else open_price
+        )
+        path = (previous_close,) + intrabar_path(open_price, high, low, close)
+
+        # Стакан пишем в тепловую карту, а цену в распределение - один раз на бар,
+        # а не на каждый отрезок пути: high/low не должны весить как отдельные тики
+        depth_buffer, self.depth_buffer = self.depth_buffer, None
+        track_distribution, self.track_distribution = self.track_distribution, False
+        try:
+            for last_price, price in zip(path[:-1], path[1:]):
+                self.check_orders(price, last_price=last_price)
+        finally:
+            self.depth_buffer = depth_buffer
+            self.track_distribution = track_distribution
+        if track_distribution:
+            self.update_price_distribution(close)
+        self.record_depth()
+
+    def record_depth(self):
+        if self.depth_buffer is not None:
+            self.depth_buffer.record(
+                len(self.price_history) - 1, self.orders, self.book_changed
+            )
+            self.book_changed = False
 
-        if should_update_grid and self.current_ema is not None:
-            self.update_grid(self.current_ema, current_price, self.price_history)
+    def record_depth_span(self, first_tick, count):
+        # Строки для тиков без изменений стакана
+        if self.depth_buffer is not None:
+            for tick in range(first_tick, first_tick + count):
+                self.depth_buffer.record(tick, self.orders, self.book_changed)
+                self.book_changed = False
 
     def update_display(self):
         # Этот метод будет вызывать обновление графика
@@ -442,22 +654,58 @@ class OrderManager:
         order.execution_price = execution_price
         order.commission = order.volume * execution_price * self.commission_rate
         order.execution_time = len(self.price_history) - 1
+        self.emit_event(
+            "order_filled",
+            id=order.id,
+            side=order.order_type,
+            price=execution_price,
+            volume=order.volume,
+        )
+        if self.ledger is not None:
+            self.ledger.record_fill(order)
 
         opposite_position = next(
             (pos for pos in self.positions if pos.order_type != order.order_type), None
         )
 
         if opposite_position:
-            profit = opposite_position.close_position(execution_price)
+            profit = opposite_position.close_position(
+                execution_price, order.execution_time
+            )
             self.profit += profit
+            if self.instrument is not None:
+                self.realized_units += opposite_position.profit_units
             self.closed_positions.append(opposite_position)
             self.positions.remove(opposite_position)
+            self.emit_event(
+                "position_closed",
+                id=opposite_position.id,
+                price=execution_price,
+                profit=profit,
+            )
             self.initialize_grid()
         else:
             new_position = Position(
-                order.order_type, execution_price, order.volume, self.commission_rate
+                order.order_type,
+                execution_price,
+                order.volume,
+                self.commission_rate,
+                self.instrument,
+                position_id=self.next_position_id,
+                entry_time=order.execution_time,
+                ledger=self.ledger,
             )
+            self.next_position_id += 1
             self.positions.append(new_position)
+            if self.ledger is not None:
+                self.ledger.record_open(new_position)
+            self.emit_event(
+                "position_opened",
+                id=new_position.id,
+                side=new_position.order_type,
+                price=new_position.entry_price,
+                volume=new_position.volume,
+            )
             self.total_commission += order.commission
 
         self.update_balance()
@@ -471,35 +719,22 @@ class OrderManager:
 
         self.calculate_free_margin()
 
-        # Рассчитываем новый шаг сетки
-        new_grid_step = self.calculate_dynamic_grid_step(order.order_type)
-
-        # Размещаем новый ордер с учетом нового шага сетки
-        new_price = execution_price * (
-            1 + new_grid_step / 100
-            if order.order_type == "buy"
-            else 1 - new_grid_step / 100
-        )
-        self.place_order(
-            "sell" if order.order_type == "buy" else "buy", new_price, order.volume
-        )
+        # Стратегия решает, какой встречный ордер выставить после исполнения
+        self.apply_intents(self.strategy.on_fill(order))
 
         self.executed_orders_history.append(order)
         if len(self.executed_orders_history) > self.distribution_period * 2:
             self.executed_orders_history.pop(0)
 
-        self.update_price_distribution(execution_price)
+        if self.track_distribution:
+            self.update_price_distribution(execution_price)
         self.orders.remove(order)
+        self.book_changed = True
         if order not in self.order_history:
             self.order_history.append(order)
 
     def calculate_dynamic_grid_step(self, order_type):
-        if order_type == "buy":
-            multiplier = min(2**self.consecutive_buys, self.max_grid_step_multiplier)
-        else:  # sell
-            multiplier = min(2**self.consecutive_sells, self.max_grid_step_multiplier)
-
-        return self.base_grid_step * multiplier
+        return self.strategy.calculate_dynamic_grid_step(order_type)
 
     def initialize_grid(self):
         if self.current_ema is not None and len(self.price_history) > 0:
@@ -568,19 +803,26 @@ class OrderManager:
 
     def initialize_grid(self):
         if self.current_ema is not None and len(self.price_history) > 0:
-            print("Initializing grid.")
+            # print("Initializing grid.")
             self.update_grid(self.current_ema, self.current_price, self.price_history)
         else:
             print("Grid initialization skipped due to missing data.")
 
     def clear_orders(self):
         self.orders = []
+        self.book_changed = True
+        if self.depth_buffer is not None:
+            self.depth_buffer.clear()
+        if self.ledger is not None:
+            self.ledger.clear()
         self.executed_orders = []
         self.order_history = []
         self.profit = 0
         self.floating_profit = 0
         self.balance = self.initial_balance
         self.free_margin = self.initial_balance
+        self.last_allocation = None
+        self.emit_event("orders_cleared")
         # print("All orders cleared and balance reset")
 
     def place_grid_orders(self, buy_prices, sell_prices, volume):
@@ -0,0 +1,309 @@
+import sys
+import time
+from multiprocessing import resource_tracker, shared_memory
+from types import SimpleNamespace
+
+import numpy as np
+
+
+STATE_MAGIC = 0x47524944  # "GRID"
+STATE_VERSION = 1
+HEADER_FIELDS = 8  # magic, версия, seq, активный слот, tail, max_orders, max_positions, finished
+SUMMARY_FIELDS = (
+    "price",
+    "ema",
+    "balance",
+    "equity",
+    "free_margin",
+    "floating_profit",
+    "profit",
+    "total_commission",
+)
+COUNT_FIELDS = 4  # tick, цен в хвосте, ордеров, позиций
+ORDER_COLUMNS = 3  # сторона (+1 buy / -1 sell), цена, объем
+POSITION_COLUMNS = 5  # сторона, цена входа, объем, плавающая прибыль, комиссия
+
+# Сегменты, созданные в этом процессе (их учетом в resource_tracker владеет публикатор)
+_published_names = set()
+
+
+def _open_segment(name, create=False, size=0, track=True):
+    # Неотслеживаемый сегмент переживает процесс: resource_tracker не удалит его при выходе
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, create=create, size=size, track=track)
+    shm = shared_memory.SharedMemory(name=name, create=create, size=size)
+    if not track:
+        resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+def _unlink_segment(shm, tracked):
+    if not tracked and sys.version_info < (3, 13):
+        # До 3.13 unlink снимает сегмент с учета в resource_tracker - вернем его на учет
+        resource_tracker.register(shm._name, "shared_memory")
+    shm.unlink()
+
+
+def _slot_size(tail, max_orders, max_positions):
+    return 8 * (
+        len(SUMMARY_FIELDS)
+        + COUNT_FIELDS
+        + tail
+        + max_orders * ORDER_COLUMNS
+        + max_positions * POSITION_COLUMNS
+    )
+
+
+def _slot_views(buffer, offset, tail, max_orders, max_positions):
+    views = {}
+    for key, dtype, shape in (
+        ("summary", np.float64, (len(SUMMARY_FIELDS),)),
+        ("counts", np.int64, (COUNT_FIELDS,)),
+        ("prices", np.float64, (tail,)),
+        ("orders", np.float64, (max_orders, ORDER_COLUMNS)),
+        ("positions", np.float64, (max_positions, POSITION_COLUMNS)),
+    ):
+        size = int(np.prod(shape))
+        views[key] = np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset)
+        offset += 8 * size
+    return views
+
+
+class StatePublisher:
+    # Последнее состояние движка в разделяемой памяти для внешних просмотрщиков.
+    # Два слота: запись идет в неактивный, затем seqlock переключает активный слот
+    # (seq нечетный - идет переключение). Симуляция не ждет читателей.
+    # По умолчанию сегмент остается после close и после выхода процесса, чтобы просмотрщик,
+    # подключившийся позже, увидел финальное состояние; удаляет его читатель (StateReader.close(unlink=True)).
+    # unlink=True - удалить сегмент сразу в close.
+    def __init__(self, name=None, interval=1000, tail=1000, max_orders=256, max_positions=1024, unlink=False):
+        self.interval = interval
+        self.unlink = unlink
+        self.tail = tail
+        self.max_orders = max_orders
+        self.max_positions = max_positions
+        slot_size = _slot_size(tail, max_orders, max_positions)
+        self.shm = _open_segment(name, create=True, size=8 * HEADER_FIELDS + 2 * slot_size, track=unlink)
+        self.name = self.shm.name
+        if unlink:
+            _published_names.add(self.name)
+        self.header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=self.shm.buf)
+        self.header[:] = (STATE_MAGIC, STATE_VERSION, 0, 0, tail, max_orders, max_positions, 0)
+        self.slots = [
+            _slot_views(self.shm.buf, 8 * HEADER_FIELDS + index * slot_size, tail, max_orders, max_positions)
+            for index in (0, 1)
+        ]
+
+    def update(self, om, tick):
+        if tick % self.interval == 0:
+            self.publish(om, tick)
+
+    def publish(self, om, tick):
+        slot = self.slots[1 - self.header[3]]
+        price = om.current_price if om.current_price is not None else 0.0
+        ema = om.current_ema if om.current_ema is not None else price
+        summary = slot["summary"]
+        summary[:] = (
+            price,
+            ema,
+            om.balance,
+            om.balance + om.floating_profit,
+            om.free_margin,
+            om.floating_profit,
+            om.profit,
+            om.total_commission,
+        )
+
+        prices = om.price_history[-self.tail :]
+        slot["prices"][: len(prices)] = prices
+
+        resting = [order for order in om.orders if not order.executed][: self.max_orders]
+        if resting:
+            slot["orders"][: len(resting)] = [
+                (1.0 if order.order_type == "buy" else -1.0, order.price, order.volume)
+                for order in resting
+            ]
+
+        positions = om.positions[: self.max_positions]
+        if positions:
+            slot["positions"][: len(positions)] = [
+                (
+                    1.0 if pos.order_type == "buy" else -1.0,
+                    pos.entry_price,
+                    pos.volume,
+                    pos.floating_profit,
+                    pos.commission,
+                )
+                for pos in positions
+            ]
+        slot["counts"][:] = (tick, len(prices), len(resting), len(positions))
+
+        # Переключение слота под seqlock
+        self.header[2] += 1
+        self.header[3] = 1 - self.header[3]
+        self.header[2] += 1
+
+    def close(self, unlink=None):
+        # Уже подключенные читатели сохраняют отображение и видят финальное состояние
+        if self.shm is None:
+            return
+        self.header[7] = 1
+        del self.header, self.slots
+        self.shm.close()
+        if self.unlink if unlink is None else unlink:
+            _unlink_segment(self.shm, self.name in _published_names)
+        _published_names.discard(self.name)
+        self.shm = None
+
+
+class PublishedState:
+    __slots__ = ("seq", "tick", "prices", "orders", "positions", "finished") + SUMMARY_FIELDS
+
+    def __init__(self, seq, finished, summary, counts, prices, orders, positions):
+        self.seq = seq
+        self.finished = finished
+        for key, value in zip(SUMMARY_FIELDS, summary.tolist()):
+            setattr(self, key, value)
+        self.tick = int(counts[0])
+        self.prices = prices
+        self.orders = orders
+        self.positions = positions
+
+    def buy_orders(self):
+        return [
+            SimpleNamespace(order_type="buy", price=price, volume=volume)
+            for side, price, volume in self.orders.tolist()
+            if side > 0
+        ]
+
+    def sell_orders(self):
+        return [
+            SimpleNamespace(order_type="sell", price=price, volume=volume)
+            for side, price, volume in self.orders.tolist()
+            if side < 0
+        ]
+
+    def open_positions(self):
+        # Атрибуты как у orders.Position - подходит для PositionsWindow.update_positions
+        return [
+            SimpleNamespace(
+                order_type="buy" if side > 0 else "sell",
+                entry_price=entry_price,
+                volume=volume,
+                floating_profit=floating_profit,
+                commission=commission,
+            )
+            for side, entry_price, volume, floating_profit, commission in self.positions.tolist()
+        ]
+
+
+class StateReader:
+    # Подключается к сегменту StatePublisher из любого процесса
+    def __init__(self, name):
+        # Читатель не должен регистрировать сегмент в resource_tracker,
+        # иначе тот удалит чужой сегмент при выходе читателя
+        self.tracked = name in _published_names
+        self.shm = _open_segment(name, track=self.tracked)
+        self.header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=self.shm.buf)
+        if self.header[0] != STATE_MAGIC or self.header[1] != STATE_VERSION:
+            raise ValueError(f"{name}: not a published engine state")
+        tail, max_orders, max_positions = (int(value) for value in self.header[4:7])
+        slot_size = _slot_size(tail, max_orders, max_positions)
+        self.slots = [
+            _slot_views(self.shm.buf, 8 * HEADER_FIELDS + index * slot_size, tail, max_orders, max_positions)
+            for index in (0, 1)
+        ]
+
+    @property
+    def seq(self):
+        return int(self.header[2])
+
+    @property
+    def finished(self):
+        return bool(self.header[7])
+
+    def read(self, copy=True, retries=1000):
+        # copy=False отдает представления прямо в разделяемую память (без копирования);
+        # они согласованы, пока is_valid(state) возвращает True
+        for _ in range(retries):
+            seq = int(self.header[2])
+            if seq == 0:
+                return None
+            if seq % 2:
+                continue
+            slot = self.slots[int(self.header[3])]
+            counts = slot["counts"].copy()
+            _, num_prices, num_orders, num_positions = counts.tolist()
+            prices = slot["prices"][:num_prices]
+            orders = slot["orders"][:num_orders]
+            positions = slot["positions"][:num_positions]
+            if copy:
+                prices, orders, positions = prices.copy(), orders.copy(), positions.copy()
+            state = PublishedState(
+                seq, self.finished, slot["summary"].copy(), counts, prices, orders, positions
+            )
+            if int(self.header[2]) == seq:
+                return state
+        return None
+
+    def is_valid(self, state):
+        # Слот читателя перезаписывается только со следующей за переключением публикацией
+        return self.seq - state.seq < 2
+
+    def close(self, unlink=False):
+        # unlink=True удаляет сегмент завершенного прогона (уже открытые отображения остаются)
+        del self.header, self.slots
+        self.shm.close()
+        if unlink:
+            _unlink_segment(self.shm, self.tracked)
+
+
+def format_dashboard(state):
+    lines = [
+        f"tick {state.tick}  price {state.price:.6f}  ema {state.ema:.6f}"
+        + ("  (finished)" if state.finished else ""),
+        f"equity {state.equity:.2f}  balance {state.balance:.2f}  free margin {state.free_margin:.2f}",
+        f"profit {state.profit:.4f}  floating {state.floating_profit:.4f}  "
+        f"commission {state.total_commission:.4f}",
+    ]
+    if len(state.prices):
+        lines.append(
+            f"last {len(state.prices)} ticks: min {state.prices.min():.6f}  max {state.prices.max():.6f}"
+        )
+    buy_orders = sorted(state.buy_orders(), key=lambda order: -order.price)
+    sell_orders = sorted(state.sell_orders(), key=lambda order: order.price)
+    lines.append(f"resting orders: {len(buy_orders)} buy / {len(sell_orders)} sell")
+    for order in reversed(sell_orders[:5]):
+        lines.append(f"    sell {order.price:12.6f}  {order.volume:.6f}")
+    lines.append(f"  ---- {state.price:.6f}")
+    for order in buy_orders[:5]:
+        lines.append(f"    buy  {order.price:12.6f}  {order.volume:.6f}")
+    lines.append(f"open positions: {len(state.positions)}")
+    for position in state.open_positions()[:10]:
+        lines.append(
+            f"    {position.order_type:<4} {position.entry_price:12.6f}  {position.volume:.6f}  "
+            f"{position.floating_profit:+.4f}"
+        )
+    return "\n".join(lines)
+
+
+def run_dashboard(name, refresh=0.5, unlink=False):
+    # Терминальный просмотрщик: перерисовывает экран при каждой новой публикации
+    reader = StateReader(name)
+    last_seq = None
+    finished = False
+    try:
+        while True:
+            finished = reader.finished
+            state = reader.read()
+            if state is not None and (state.seq != last_seq or finished):
+                last_seq = state.seq
+                print("\x1b[H\x1b[2J" + format_dashboard(state), flush=True)
+            if finished:
+                break
+            time.sleep(refresh)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        reader.close(unlink=unlink and finished)
+    return 0
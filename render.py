@@ -0,0 +1,242 @@
+import os
+import shutil
+import subprocess
+import multiprocessing
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+
+import numpy as np
+
+
+class RunRecorder:
+    # Записывает прогон для последующего офлайн-рендера: ряды по тикам целиком,
+    # стакан и гистограмму - только на кадрах (каждые frame_stride тиков)
+    def __init__(self, frame_stride=1000):
+        self.frame_stride = frame_stride
+        self.prices = array("d")
+        self.emas = array("d")
+        self.balance = array("d")
+        self.free_margin = array("d")
+        self.margin = array("d")
+        self.execution_time = array("q")
+        self.execution_price = array("d")
+        self.execution_side = array("b")
+        self.frame_ticks = array("q")
+        self.frame_buy = []
+        self.frame_sell = []
+        self.frame_distribution = []
+        self._history_index = 0
+
+    def record(self, om, tick):
+        price = om.current_price
+        self.prices.append(price)
+        self.emas.append(om.current_ema)
+        self.balance.append(om.balance)
+        self.free_margin.append(om.free_margin)
+        self.margin.append(sum(pos.volume for pos in om.positions) * price)
+        if tick % self.frame_stride == 0:
+            self.capture_frame(om, tick)
+
+    def capture_frame(self, om, tick):
+        # Новые исполнения с прошлого кадра (order_history только растет)
+        if self._history_index > len(om.order_history):
+            self._history_index = 0
+        for order in om.order_history[self._history_index :]:
+            self.execution_time.append(order.execution_time)
+            self.execution_price.append(order.execution_price)
+            self.execution_side.append(1 if order.order_type == "buy" else -1)
+        self._history_index = len(om.order_history)
+
+        resting = [order for order in om.orders if not order.executed]
+        self.frame_ticks.append(tick)
+        self.frame_buy.append([order.price for order in resting if order.order_type == "buy"])
+        self.frame_sell.append([order.price for order in resting if order.order_type == "sell"])
+        self.frame_distribution.append(om.get_price_distribution_data())
+
+    def save(self, path):
+        def ragged(rows):
+            offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+            offsets[1:] = np.cumsum([len(row) for row in rows])
+            values = np.fromiter((value for row in rows for value in row), float, int(offsets[-1]))
+            return values, offsets
+
+        buy_prices, buy_offsets = ragged(self.frame_buy)
+        sell_prices, sell_offsets = ragged(self.frame_sell)
+        hist, edges, normal, normal_x = ragged_distributions(self.frame_distribution)
+        np.savez_compressed(
+            path,
+            prices=np.frombuffer(self.prices),
+            emas=np.frombuffer(self.emas),
+            balance=np.frombuffer(self.balance),
+            free_margin=np.frombuffer(self.free_margin),
+            margin=np.frombuffer(self.margin),
+            execution_time=np.frombuffer(self.execution_time, dtype=np.int64),
+            execution_price=np.frombuffer(self.execution_price),
+            execution_side=np.frombuffer(self.execution_side, dtype=np.int8),
+            frame_ticks=np.frombuffer(self.frame_ticks, dtype=np.int64),
+            buy_prices=buy_prices,
+            buy_offsets=buy_offsets,
+            sell_prices=sell_prices,
+            sell_offsets=sell_offsets,
+            hist=hist,
+            edges=edges,
+            normal=normal,
+            normal_x=normal_x,
+        )
+
+
+def ragged_distributions(distributions):
+    # Гистограммы всех кадров одной длины, поэтому хранятся матрицами; пустые кадры - NaN
+    sample = next((data for data in distributions if data is not None), None)
+    if sample is None:
+        empty = np.empty((len(distributions), 0))
+        return empty, empty, empty, empty
+    shapes = [len(sample[key]) for key in ("hist", "bin_edges", "normal_dist", "x")]
+    arrays = [np.full((len(distributions), size), np.nan) for size in shapes]
+    for row, data in enumerate(distributions):
+        if data is None:
+            continue
+        for target, key in zip(arrays, ("hist", "bin_edges", "normal_dist", "x")):
+            values = np.asarray(data[key], dtype=float)
+            if len(values) == target.shape[1]:
+                target[row] = values
+    return arrays
+
+
+class RunRecording:
+    def __init__(self, path):
+        with np.load(path) as data:
+            for key in data.files:
+                setattr(self, key, data[key])
+
+    def __len__(self):
+        return len(self.frame_ticks)
+
+    def frame(self, index, visible_range=1000):
+        tick = int(self.frame_ticks[index])
+        end = tick + 1
+        start = max(0, end - visible_range)
+        executed = slice(
+            np.searchsorted(self.execution_time, start, side="left"),
+            np.searchsorted(self.execution_time, tick, side="right"),
+        )
+        distribution = None
+        if self.hist.shape[1] and not np.isnan(self.hist[index, 0]):
+            distribution = {
+                "hist": self.hist[index],
+                "bin_edges": self.edges[index],
+                "normal_dist": self.normal[index],
+                "x": self.normal_x[index],
+                "current_price": self.prices[tick],
+            }
+        return {
+            "tick": tick,
+            "start": start,
+            "end": end,
+            "buy": self.buy_prices[self.buy_offsets[index] : self.buy_offsets[index + 1]],
+            "sell": self.sell_prices[self.sell_offsets[index] : self.sell_offsets[index + 1]],
+            "execution_time": self.execution_time[executed],
+            "execution_price": self.execution_price[executed],
+            "execution_side": self.execution_side[executed],
+            "distribution": distribution,
+        }
+
+
+def draw_frame(graph, recording, frame):
+    start, end, tick = frame["start"], frame["end"], frame["tick"]
+    x = np.arange(start, end)
+    graph.price_curve.setData(x, recording.prices[start:end])
+    graph.ema_curve.setData(x, recording.emas[start:end])
+    graph.graphWidget.setXRange(start, end)
+
+    # MarketGraph рисует стакан и историю по объектам ордеров, хватает нужных атрибутов
+    buy_orders = [SimpleNamespace(price=price) for price in frame["buy"]]
+    sell_orders = [SimpleNamespace(price=price) for price in frame["sell"]]
+    graph.update_order_book(buy_orders, sell_orders, tick, recording.prices[tick])
+    graph.update_order_history(
+        [
+            SimpleNamespace(
+                executed=True,
+                execution_time=time,
+                execution_price=price,
+                order_type="buy" if side > 0 else "sell",
+            )
+            for time, price, side in zip(
+                frame["execution_time"], frame["execution_price"], frame["execution_side"]
+            )
+        ]
+    )
+    graph.update_balance_graph(
+        recording.balance[start:end].tolist(),
+        recording.free_margin[start:end].tolist(),
+        recording.margin[start:end].tolist(),
+        x=x,
+    )
+    if frame["distribution"] is not None:
+        graph.distribution_data = frame["distribution"]
+        graph.update_distribution_chart()
+
+
+def _render_chunk(recording_path, output_dir, frame_indices, size, visible_range):
+    # Каждый процесс поднимает свой QApplication без экрана
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5 import QtWidgets
+    from graph import MarketGraph
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    recording = RunRecording(recording_path)
+    graph = MarketGraph()
+    graph.visible_range = visible_range
+    graph.resize(*size)
+    graph.show()
+    for index in frame_indices:
+        draw_frame(graph, recording, recording.frame(index, visible_range))
+        app.processEvents()
+        graph.grab().save(os.path.join(output_dir, f"frame_{index:06d}.png"))
+    graph.close()
+    return len(frame_indices)
+
+
+def render_recording(
+    recording_path,
+    output,
+    workers=None,
+    size=(1280, 720),
+    visible_range=1000,
+    fps=30,
+    frame_step=1,
+):
+    # output - каталог для PNG, либо файл .mp4/.webm/.gif (кадры кодируются через ffmpeg)
+    video = os.path.splitext(output)[1].lower() in (".mp4", ".webm", ".gif", ".mkv")
+    output_dir = output + ".frames" if video else output
+    os.makedirs(output_dir, exist_ok=True)
+
+    num_frames = len(RunRecording(recording_path))
+    indices = list(range(0, num_frames, frame_step))
+    workers = workers or os.cpu_count() or 1
+    chunks = [indices[i::workers] for i in range(workers) if indices[i::workers]]
+
+    with ProcessPoolExecutor(
+        max_workers=len(chunks) or 1, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        futures = [
+            executor.submit(_render_chunk, recording_path, output_dir, chunk, size, visible_range)
+            for chunk in chunks
+        ]
+        rendered = sum(future.result() for future in futures)
+
+    if video:
+        if shutil.which("ffmpeg") is None:
+            raise RuntimeError("ffmpeg not found; PNG frames are in " + output_dir)
+        subprocess.run(
+            [
+                "ffmpeg", "-y", "-loglevel", "error",
+                "-framerate", str(fps),
+                "-pattern_type", "glob", "-i", os.path.join(output_dir, "frame_*.png"),
+                "-pix_fmt", "yuv420p",
+                output,
+            ],
+            check=True,
+        )
+    return rendered
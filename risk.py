@@ -0,0 +1,198 @@
+import time
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+
+EQUITY_PERCENTILES = (5, 25, 50, 75, 95)
+
+logger = logging.getLogger(__name__)
+
+
+def take_risk_snapshot(order_manager, volatility, tick=None):
+    # Компактный снимок: позиции и сетка - по одному массиву (сторона, цена, объем),
+    # такой словарь дешево сериализуется и передается в процесс
+    positions = np.array(
+        [
+            (1.0 if pos.order_type == "buy" else -1.0, pos.entry_price, pos.volume)
+            for pos in order_manager.positions
+        ],
+        dtype=float,
+    ).reshape(-1, 3)
+    orders = np.array(
+        [
+            (1.0 if order.order_type == "buy" else -1.0, order.price, order.volume)
+            for order in order_manager.orders
+            if not order.executed
+        ],
+        dtype=float,
+    ).reshape(-1, 3)
+    return {
+        "tick": tick if tick is not None else len(order_manager.price_history) - 1,
+        "price": order_manager.current_price,
+        "balance": order_manager.balance,
+        "volatility": volatility,
+        "positions": positions,
+        "orders": orders,
+    }
+
+
+def estimate_volatility(price_history, window=1000, default=0.001):
+    if len(price_history) < 3:
+        return default
+    prices = np.asarray(price_history[-window:], dtype=float)
+    returns = np.diff(np.log(prices))
+    volatility = float(returns.std())
+    return volatility if volatility > 0 else default
+
+
+def simulate_forward_risk(snapshot, num_paths=2000, horizon=500, seed=None, chunk_size=256):
+    start_time = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    price = snapshot["price"]
+    balance = snapshot["balance"]
+
+    position_sign, position_entry, position_volumes = snapshot["positions"].T
+    signed_volume = position_sign * position_volumes
+    position_cost = float(np.dot(signed_volume, position_entry))
+    position_volume = float(position_volumes.sum())
+    order_sign, order_price, order_volume = snapshot["orders"].T
+    order_signed_volume = order_sign * order_volume
+    is_buy = order_sign > 0
+
+    exhausted = np.zeros(num_paths, dtype=bool)
+    max_drawdown = np.empty(num_paths)
+    equity = np.empty((num_paths, horizon))
+
+    for lo in range(0, num_paths, chunk_size):
+        hi = min(lo + chunk_size, num_paths)
+        returns = rng.normal(0.0, snapshot["volatility"], (hi - lo, horizon))
+        paths = price * np.exp(np.cumsum(returns, axis=1))
+
+        # Текущие позиции: плавающий P&L линеен по цене
+        floating = paths * signed_volume.sum() - position_cost
+        exposure = np.full(paths.shape, position_volume)
+
+        if len(order_price):
+            # Ордер сетки открывает позицию с первого пересечения его цены.
+            # Взаимозачет позиций не моделируется - оценка получается консервативной.
+            crossed = np.where(
+                is_buy,
+                paths[:, :, None] <= order_price,
+                paths[:, :, None] >= order_price,
+            )
+            active = np.logical_or.accumulate(crossed, axis=1)
+            floating += np.einsum(
+                "pto,o->pt", active * (paths[:, :, None] - order_price), order_signed_volume
+            )
+            exposure += active @ order_volume
+
+        chunk_equity = balance + floating
+        margin_left = chunk_equity - exposure * paths
+        exhausted[lo:hi] = (margin_left <= 0).any(axis=1)
+        running_peak = np.maximum.accumulate(
+            np.concatenate([np.full((hi - lo, 1), balance), chunk_equity], axis=1), axis=1
+        )[:, 1:]
+        max_drawdown[lo:hi] = (running_peak - chunk_equity).max(axis=1)
+        equity[lo:hi] = chunk_equity
+
+    bands = np.percentile(equity, EQUITY_PERCENTILES, axis=0)
+    return {
+        "tick": snapshot["tick"],
+        "horizon": horizon,
+        "num_paths": num_paths,
+        "margin_exhaustion_probability": float(exhausted.mean()),
+        "expected_max_drawdown": float(max_drawdown.mean()),
+        "equity_bands": dict(zip(EQUITY_PERCENTILES, bands)),
+        "elapsed": time.perf_counter() - start_time,
+    }
+
+
+class RiskWorker:
+    # Периодически отправляет снимок состояния в отдельный процесс и забирает результат
+    # без ожидания, поэтому цикл симуляции не блокируется. Сбой расчета (падение процесса,
+    # ошибка сериализации) пишется в лог, результат пропускается, пул создается заново.
+    def __init__(self, interval=1000, num_paths=2000, horizon=500, volatility=None, seed=None):
+        self.interval = interval
+        self.num_paths = num_paths
+        self.horizon = horizon
+        self.volatility = volatility
+        self.seed = seed
+        self.executor = None
+        self.pending = None
+        self.pending_tick = None
+        self.latest = None
+        self.last_submit_tick = None
+        self.failures = 0
+        # Движок опрашивает воркер не на каждом тике, а с шагом poll_interval
+        self.poll_interval = max(1, interval // 10)
+        self.next_poll_tick = 0
+
+    def start(self):
+        if self.executor is None:
+            # spawn: не копируем в дочерний процесс состояние Qt из GUI-процесса
+            self.executor = ProcessPoolExecutor(
+                max_workers=1, mp_context=multiprocessing.get_context("spawn")
+            )
+
+    def restart(self):
+        executor, self.executor = self.executor, None
+        self.pending = None
+        if executor is not None:
+            try:
+                executor.shutdown(wait=False, cancel_futures=True)
+            except Exception:
+                pass
+
+    def collect(self):
+        pending, tick = self.pending, self.pending_tick
+        self.pending = None
+        try:
+            result = pending.result()
+        except Exception as error:
+            self.failures += 1
+            logger.warning("risk projection for tick %s failed: %r", tick, error)
+            self.restart()
+            return None
+        self.latest = result
+        return result
+
+    def update(self, order_manager, tick):
+        self.next_poll_tick = tick + self.poll_interval
+        published = None
+        if self.pending is not None and self.pending.done():
+            published = self.collect()
+
+        if (
+            self.pending is None
+            and order_manager.current_price is not None
+            and (self.last_submit_tick is None or tick - self.last_submit_tick >= self.interval)
+        ):
+            self.last_submit_tick = tick
+            volatility = self.volatility
+            if volatility is None:
+                volatility = estimate_volatility(order_manager.price_history)
+            snapshot = take_risk_snapshot(order_manager, volatility, tick)
+            seed = None if self.seed is None else self.seed + tick
+            try:
+                self.start()
+                self.pending = self.executor.submit(
+                    simulate_forward_risk, snapshot, self.num_paths, self.horizon, seed
+                )
+                self.pending_tick = tick
+            except Exception as error:
+                self.failures += 1
+                logger.warning("risk projection for tick %s not submitted: %r", tick, error)
+                self.restart()
+
+        return published
+
+    def shutdown(self, wait=True):
+        if self.pending is not None and wait:
+            self.collect()
+        self.pending = None
+        if self.executor is not None:
+            self.executor.shutdown(wait=wait, cancel_futures=not wait)
+            self.executor = None
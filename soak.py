@@ -0,0 +1,180 @@
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+from engine import SimulationEngine
+
+
+# Контейнеры OrderManager, которые растут вместе с длиной прогона
+SOAK_CONTAINERS = (
+    "orders",
+    "order_history",
+    "executed_orders_history",
+    "closed_positions",
+    "price_history",
+    "price_distribution",
+    "price_frequency",
+)
+
+
+def current_rss():
+    # Резидентная память процесса в байтах (Linux); иначе пиковое значение из getrusage
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _item_size(item):
+    size = sys.getsizeof(item)
+    attributes = getattr(item, "__dict__", None)
+    if attributes is not None:
+        size += sys.getsizeof(attributes)
+        size += sum(sys.getsizeof(value) for value in attributes.values())
+    return size
+
+
+def container_footprint(container, sample_size=1000):
+    # Оценка по равномерной выборке элементов: полный обход десятков миллионов
+    # объектов на каждом замере сам по себе стал бы узким местом
+    size = sys.getsizeof(container)
+    length = len(container)
+    if length == 0:
+        return size
+    step = max(1, length // sample_size)
+    if isinstance(container, dict):
+        keys = list(container.keys())[::step]
+        sample = [_item_size(key) + _item_size(container[key]) for key in keys]
+    else:
+        sample = [_item_size(item) for item in container[::step]]
+    return size + int(sum(sample) / len(sample) * length)
+
+
+def measure_containers(order_manager):
+    return {
+        name: {
+            "length": len(getattr(order_manager, name)),
+            "bytes": container_footprint(getattr(order_manager, name)),
+        }
+        for name in SOAK_CONTAINERS
+    }
+
+
+def top_growth(snapshot, previous, limit=10):
+    statistics = snapshot.compare_to(previous, "lineno")
+    return [(str(stat.traceback), stat.size_diff / 2**20, stat.count_diff) for stat in statistics[:limit]]
+
+
+def run_soak(
+    num_ticks,
+    seed=0,
+    sample_interval=1000000,
+    warmup_ticks=None,
+    max_growth_mb=256.0,
+    trace=False,
+    trace_every=1,
+    chunk_size=100000,
+    **engine_options,
+):
+    engine = SimulationEngine(seed=seed, **engine_options)
+    warmup_ticks = sample_interval if warmup_ticks is None else warmup_ticks
+
+    if trace:
+        tracemalloc.start()
+    start_time = time.perf_counter()
+    samples = []
+    baseline_rss = None
+    baseline_snapshot = None
+    previous_snapshot = None
+    failed_at = None
+    processed = 0
+
+    try:
+        while processed < num_ticks:
+            # Блок обрезается по границе замера, чтобы интервал соблюдался точно
+            size = min(chunk_size, num_ticks - processed, sample_interval - processed % sample_interval)
+            engine.run_prices(engine.generate_prices(size))
+            processed += size
+            if processed % sample_interval and processed < num_ticks:
+                continue
+
+            gc.collect()
+            rss = current_rss()
+            sample = {
+                "tick": processed,
+                "elapsed": time.perf_counter() - start_time,
+                "rss_mb": rss / 2**20,
+                "containers": measure_containers(engine.order_manager),
+            }
+            snapshot = None
+            if trace:
+                sample["traced_mb"] = tracemalloc.get_traced_memory()[0] / 2**20
+                # Снимок на каждом trace_every-м замере: рост аллокаций с предыдущего снимка
+                if len(samples) % trace_every == 0 or processed >= num_ticks:
+                    snapshot = tracemalloc.take_snapshot()
+                    if previous_snapshot is not None:
+                        sample["top_growth"] = top_growth(snapshot, previous_snapshot)
+                    previous_snapshot = snapshot
+            samples.append(sample)
+
+            # Отсчет роста ведем от первого замера после прогрева
+            if baseline_rss is None and processed >= warmup_ticks:
+                baseline_rss = rss
+                if trace:
+                    baseline_snapshot = snapshot if snapshot is not None else tracemalloc.take_snapshot()
+            elif baseline_rss is not None:
+                sample["growth_mb"] = (rss - baseline_rss) / 2**20
+                if sample["growth_mb"] > max_growth_mb:
+                    failed_at = processed
+                    break
+
+        total_growth = []
+        if trace and baseline_snapshot is not None:
+            total_growth = top_growth(tracemalloc.take_snapshot(), baseline_snapshot)
+    finally:
+        if trace:
+            tracemalloc.stop()
+
+    return {
+        "ticks": processed,
+        "seed": seed,
+        "passed": failed_at is None,
+        "failed_at": failed_at,
+        "max_growth_mb": max_growth_mb,
+        "samples": samples,
+        "top_growth": total_growth,
+        "report": engine.get_report(),
+    }
+
+
+def format_soak_report(result):
+    lines = []
+    for sample in result["samples"]:
+        growth = sample.get("growth_mb")
+        growth_text = f" growth={growth:+.1f}MB" if growth is not None else ""
+        lines.append(f"tick {sample['tick']}: rss={sample['rss_mb']:.1f}MB{growth_text}")
+        for name, stats in sample["containers"].items():
+            lines.append(
+                f"    {name:<24} len={stats['length']:<10} ~{stats['bytes'] / 2**20:.2f}MB"
+            )
+        if sample.get("top_growth"):
+            lines.append("    allocation growth since previous snapshot:")
+            for location, size_mb, count in sample["top_growth"][:3]:
+                lines.append(f"        {size_mb:+.2f}MB ({count:+d} blocks) {location}")
+    if result["top_growth"]:
+        lines.append("Top allocation growth since baseline:")
+        for location, size_mb, count in result["top_growth"]:
+            lines.append(f"    {size_mb:+.2f}MB ({count:+d} blocks) {location}")
+    if result["passed"]:
+        lines.append(f"PASSED: {result['ticks']} ticks within {result['max_growth_mb']}MB growth")
+    else:
+        lines.append(
+            f"FAILED at tick {result['failed_at']}: memory grew more than {result['max_growth_mb']}MB"
+        )
+    return "\n".join(lines)
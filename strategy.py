@@ -0,0 +1,187 @@
+import numpy as np
+
+
+class OrderIntent:
+    # Намерение стратегии, которое исполняет OrderManager.apply_intents:
+    #   "rebuild_grid" - снять стоящие ордера и выставить сетку из векторов цен и объемов
+    #   "place"        - выставить один ордер
+    #   "cancel_all"   - снять все стоящие ордера
+    __slots__ = (
+        "action",
+        "side",
+        "price",
+        "volume",
+        "buy_prices",
+        "buy_volumes",
+        "sell_prices",
+        "sell_volumes",
+        "ema",
+    )
+
+    def __init__(
+        self,
+        action,
+        side=None,
+        price=None,
+        volume=None,
+        buy_prices=None,
+        buy_volumes=None,
+        sell_prices=None,
+        sell_volumes=None,
+        ema=None,
+    ):
+        self.action = action
+        self.side = side
+        self.price = price
+        self.volume = volume
+        self.buy_prices = buy_prices
+        self.buy_volumes = buy_volumes
+        self.sell_prices = sell_prices
+        self.sell_volumes = sell_volumes
+        self.ema = ema
+
+
+class Strategy:
+    # Базовый интерфейс. on_ticks получает пачку тиков массивами NumPy и возвращает
+    # список OrderIntent; исполнения внутри пачки движок обрабатывает сам.
+    def bind(self, order_manager):
+        self.order_manager = order_manager
+
+    def on_ticks(self, prices, times):
+        return []
+
+    def on_tick(self, price, time):
+        return self.on_ticks(np.array([price]), np.array([time]))
+
+    def on_fill(self, order):
+        return []
+
+    def build_grid(self, ema, current_price, price_history):
+        return None
+
+
+class GridStrategy(Strategy):
+    # Эталонная реализация: перенос сеточной логики, которая раньше жила в OrderManager.
+    # Параметры (base_grid_step, volume_growth_factor, consecutive_buys и т.д.)
+    # читаются из OrderManager, чтобы их можно было менять на лету и в вариантах.
+    def __init__(self, num_levels=10, rebuild_side_ratio=0.2):
+        self.num_levels = num_levels
+        self.rebuild_side_ratio = rebuild_side_ratio
+        self.order_manager = None
+
+    def calculate_dynamic_grid_step(self, order_type):
+        om = self.order_manager
+        if order_type == "buy":
+            multiplier = min(2**om.consecutive_buys, om.max_grid_step_multiplier)
+        else:  # sell
+            multiplier = min(2**om.consecutive_sells, om.max_grid_step_multiplier)
+
+        return om.base_grid_step * multiplier
+
+    def create_asymmetric_grid(
+        self,
+        ema,
+        current_price,
+        lower_bound,
+        upper_bound,
+        buy_step,
+        sell_step,
+        num_levels=None,
+    ):
+        if num_levels is None:
+            num_levels = self.num_levels
+        buy_range = ema - lower_bound
+        sell_range = upper_bound - ema
+
+        total_range = buy_range + sell_range
+        if total_range > 0:
+            buy_levels = int(num_levels * (buy_range / total_range))
+        else:
+            buy_levels = num_levels // 2
+        # EMA может оказаться за границей сетки - число уровней не должно быть отрицательным
+        buy_levels = min(max(buy_levels, 0), num_levels)
+        sell_levels = num_levels - buy_levels
+
+        # Уровни отстоят от текущей цены на кратный динамический шаг
+        buy_prices = current_price * (1 - np.arange(1, buy_levels + 1) * buy_step / 100)
+        sell_prices = current_price * (1 + np.arange(1, sell_levels + 1) * sell_step / 100)
+
+        return buy_prices, sell_prices
+
+    def calculate_base_volume(self, current_price):
+        return (
+            self.order_manager.free_margin * 0.01 / current_price
+        )  # Используем 1% свободной маржи для базового объема
+
+    def should_update_grid(self, buy_count, sell_count):
+        total_orders = buy_count + sell_count
+        if total_orders == 0:
+            return True
+        threshold = total_orders * self.rebuild_side_ratio
+        # Мало ордеров с одной стороны - сетку пора перестроить
+        return buy_count <= threshold or sell_count <= threshold
+
+    def build_grid(self, ema, current_price, price_history):
+        om = self.order_manager
+        lower_bound, upper_bound = om.calculate_grid_boundaries(ema, price_history)
+
+        # Рассчитываем динамические шаги сетки для покупок и продаж
+        buy_step = self.calculate_dynamic_grid_step("buy")
+        sell_step = self.calculate_dynamic_grid_step("sell")
+
+        buy_prices, sell_prices = self.create_asymmetric_grid(
+            ema, current_price, lower_bound, upper_bound, buy_step, sell_step
+        )
+
+        base_volume = self.calculate_base_volume(current_price)
+        # Степени считаются питоновским float, чтобы объемы совпадали бит-в-бит с прежними
+        growth = np.array([om.volume_growth_factor**i for i in range(self.num_levels)])
+        return OrderIntent(
+            "rebuild_grid",
+            price=current_price,
+            buy_prices=buy_prices,
+            buy_volumes=base_volume * growth[: len(buy_prices)],
+            sell_prices=sell_prices,
+            sell_volumes=base_volume * growth[: len(sell_prices)],
+            ema=ema,
+        )
+
+    def _grid_intents(self, price):
+        om = self.order_manager
+        buy_count = 0
+        sell_count = 0
+        for order in om.orders:
+            if not order.executed:
+                if order.order_type == "buy":
+                    buy_count += 1
+                else:
+                    sell_count += 1
+        if om.current_ema is not None and self.should_update_grid(buy_count, sell_count):
+            return [self.build_grid(om.current_ema, price, om.price_history)]
+        return []
+
+    def on_tick(self, price, time):
+        return self._grid_intents(price)
+
+    def on_ticks(self, prices, times):
+        # Состояние сетки оценивается один раз на конец пачки
+        if len(prices) == 0:
+            return []
+        return self._grid_intents(float(prices[-1]))
+
+    def on_fill(self, order):
+        # Встречный ордер на расстоянии нового динамического шага от цены исполнения
+        new_grid_step = self.calculate_dynamic_grid_step(order.order_type)
+        new_price = order.execution_price * (
+            1 + new_grid_step / 100
+            if order.order_type == "buy"
+            else 1 - new_grid_step / 100
+        )
+        return [
+            OrderIntent(
+                "place",
+                side="sell" if order.order_type == "buy" else "buy",
+                price=new_price,
+                volume=order.volume,
+            )
+        ]
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from allocation import ALLOCATION_POLICIES, allocate_margin
+
+
+COMMISSION = 0.00016
+
+
+def random_grid(seed, levels=20):
+    rng = np.random.default_rng(seed)
+    prices = 100 + rng.normal(0, 5, levels)
+    volumes = rng.uniform(0.1, 3.0, levels)
+    distances = np.abs(prices - 100)
+    return prices, volumes, distances
+
+
+@pytest.mark.parametrize("policy", ALLOCATION_POLICIES)
+@pytest.mark.parametrize("seed", range(10))
+def test_budget_never_exceeded(policy, seed):
+    prices, volumes, distances = random_grid(seed)
+    requested = (prices * volumes * (1 + COMMISSION)).sum()
+    for budget in (requested * 0.1, requested * 0.5, requested * 0.99):
+        allocation = allocate_margin(prices, volumes, distances, budget, COMMISSION, policy)
+        spent = (prices * allocation.volumes * (1 + COMMISSION)).sum()
+        assert spent <= budget * (1 + 1e-12)
+        assert allocation.report()["allocated_margin"] == pytest.approx(budget)
+        assert np.all(allocation.volumes >= 0)
+        assert np.all(allocation.volumes <= allocation.requested_volumes)
+
+
+@pytest.mark.parametrize("policy", ALLOCATION_POLICIES)
+def test_untrimmed_levels_keep_exact_volume(policy):
+    prices, volumes, distances = random_grid(1)
+    requested = (prices * volumes * (1 + COMMISSION)).sum()
+    allocation = allocate_margin(prices, volumes, distances, requested * 2, COMMISSION, policy)
+    assert np.array_equal(allocation.volumes, volumes)
+    assert allocation.report()["trimmed_volume"] == 0.0
+
+    allocation = allocate_margin(prices, volumes, distances, requested * 0.6, COMMISSION, policy)
+    kept = ~allocation.trimmed
+    assert np.array_equal(allocation.volumes[kept], volumes[kept])
+
+
+def test_near_first_funds_closest_levels_first():
+    prices, volumes, distances = random_grid(2)
+    requested = prices * volumes * (1 + COMMISSION)
+    allocation = allocate_margin(prices, volumes, distances, requested.sum() * 0.4, COMMISSION, "near_first")
+    order = np.argsort(distances, kind="stable")
+    funded = allocation.volumes[order] / volumes[order]
+    # Полностью, затем один частично, затем ничего
+    assert np.all(np.diff(funded) <= 0)
+    assert funded[0] == 1.0 and funded[-1] == 0.0
+    assert np.count_nonzero((funded > 0) & (funded < 1)) <= 1
+
+
+def test_equal_risk_water_fill_level():
+    prices = np.array([10.0, 20.0, 50.0, 100.0])
+    volumes = np.ones(4)
+    distances = np.arange(4.0)
+    # Потолок 40: уровни 10 и 20 проходят целиком, 50 и 100 урезаются до 40
+    allocation = allocate_margin(prices, volumes, distances, 110.0, policy="equal_risk")
+    assert allocation.allocated_margin.tolist() == pytest.approx([10.0, 20.0, 40.0, 40.0])
+    assert allocation.volumes[:2].tolist() == [1.0, 1.0]
+    assert allocation.trimmed.tolist() == [False, False, True, True]
+
+
+@pytest.mark.parametrize("policy", ALLOCATION_POLICIES)
+def test_empty_grid(policy):
+    allocation = allocate_margin([], [], [], 100.0, COMMISSION, policy)
+    report = allocation.report()
+    assert report["levels"] == 0
+    assert report["allocated_margin"] == 0.0
+
+
+@pytest.mark.parametrize("policy", ALLOCATION_POLICIES)
+@pytest.mark.parametrize("budget", [0.0, -5.0])
+def test_zero_budget_drops_all_levels(policy, budget):
+    prices, volumes, distances = random_grid(3)
+    allocation = allocate_margin(prices, volumes, distances, budget, COMMISSION, policy)
+    assert np.all(allocation.volumes == 0)
+    report = allocation.report()
+    assert report["budget"] == 0.0
+    assert report["dropped_levels"] == len(prices)
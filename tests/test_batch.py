@@ -0,0 +1,34 @@
+import pytest
+
+from engine import SimulationEngine
+from instrument import InstrumentSpec
+
+
+def batch_run(batch_size, recorder=False, **options):
+    engine = SimulationEngine(seed=1, **options)
+    if recorder:
+        # С записью по тикам step_batch идет через process_fills на каждом тике
+        engine.attach_recorder()
+    report = engine.run_batches(30000, batch_size)
+    report.pop("elapsed", None)
+    om = engine.order_manager
+    return report, om.price_distribution, om.price_frequency, om.current_ema, om.price_extremes
+
+
+@pytest.mark.parametrize("batch_size", [7, 100])
+@pytest.mark.parametrize("instrument", [None, InstrumentSpec(tick_size=0.01, lot_size=0.001)])
+def test_quiet_tick_skipping_matches_per_tick_fills(batch_size, instrument):
+    fast = batch_run(batch_size, instrument=instrument)
+    slow = batch_run(batch_size, recorder=True, instrument=instrument)
+    assert fast[0]["executed_orders"] > 0
+    assert fast == slow
+
+
+def test_batch_of_one_matches_tick_mode():
+    engine = SimulationEngine(seed=1)
+    tick_report = engine.run(20000)
+    engine = SimulationEngine(seed=1)
+    batch_report = engine.run_batches(20000, 1)
+    tick_report.pop("elapsed", None)
+    batch_report.pop("elapsed", None)
+    assert batch_report == tick_report
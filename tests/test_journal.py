@@ -0,0 +1,79 @@
+import pytest
+
+from engine import SimulationEngine
+from journal import EVENT_KINDS, JournalWriter, diff_journals, read_journal, record_to_dict
+
+
+def write_events(path, count, changed_index=None):
+    with JournalWriter(path, buffer_records=7) as journal:
+        for index in range(count):
+            price = 100.0 + index * 0.01
+            if index == changed_index:
+                price += 0.5
+            journal(index, "order_placed", {"id": index, "side": "buy", "price": price, "volume": 1.0})
+    return path
+
+
+def test_round_trip(tmp_path):
+    engine = SimulationEngine(seed=1)
+    path = str(tmp_path / "run.bin")
+    journal = engine.attach_journal(path, buffer_records=64)
+    events = []
+    engine.order_manager.event_listeners.append(lambda tick, kind, fields: events.append((tick, kind, fields)))
+    engine.run(5000)
+    engine.close()
+
+    records = read_journal(path)
+    assert len(records) == len(journal) == len(events) > 0
+    for record, (tick, kind, fields) in zip(records, events):
+        row = record_to_dict(record)
+        assert (row["tick"], row["kind"]) == (tick, kind)
+        assert row["id"] == fields.get("id", -1)
+        if kind == "order_placed":
+            assert (row["a"], row["b"]) == (fields["price"], fields["volume"])
+    assert records["seq"].tolist() == list(range(len(records)))
+
+
+def test_identical_journals(tmp_path):
+    left = write_events(str(tmp_path / "left.bin"), 100)
+    right = write_events(str(tmp_path / "right.bin"), 100)
+    diff = diff_journals(left, right, chunk_records=16)
+    assert diff["first_divergence"] is None
+    assert diff["records"] == (100, 100)
+    assert diff["counts"]["order_placed"] == (100, 100)
+    assert set(diff["counts"]) == set(EVENT_KINDS)
+
+
+@pytest.mark.parametrize("chunk_records", [1, 5, 37, 65536])
+def test_single_field_change_reports_exact_index(tmp_path, chunk_records):
+    # chunk_records меньше смещения расхождения - расхождение лежит в одном из поздних блоков
+    left = write_events(str(tmp_path / "left.bin"), 100)
+    right = write_events(str(tmp_path / "right.bin"), 100, changed_index=73)
+    diff = diff_journals(left, right, chunk_records=chunk_records)
+    divergence = diff["first_divergence"]
+    assert divergence["index"] == 73
+    assert divergence["right"]["a"] - divergence["left"]["a"] == pytest.approx(0.5)
+    assert diff_journals(left, right, tolerance=1.0, chunk_records=chunk_records)["first_divergence"] is None
+
+
+def test_unequal_lengths(tmp_path):
+    left = write_events(str(tmp_path / "left.bin"), 60)
+    right = write_events(str(tmp_path / "right.bin"), 45)
+    diff = diff_journals(left, right, chunk_records=16)
+    divergence = diff["first_divergence"]
+    assert divergence["index"] == 45
+    assert divergence["left"]["id"] == 45
+    assert divergence["right"] is None
+    assert diff["records"] == (60, 45)
+    assert diff["last_tick"] == (59, 44)
+
+
+def test_truncated_tail_is_dropped(tmp_path):
+    path = write_events(str(tmp_path / "left.bin"), 20)
+    with open(path, "ab") as journal:
+        journal.write(b"\x01" * 10)
+    records = read_journal(path)
+    assert len(records) == 20
+    assert int(records["id"][-1]) == 19
+    reference = write_events(str(tmp_path / "right.bin"), 20)
+    assert diff_journals(path, reference, chunk_records=3)["first_divergence"] is None
@@ -0,0 +1,11 @@
+from engine import SimulationEngine
+
+
+def test_clear_orders_resets_ledger():
+    engine = SimulationEngine(seed=1)
+    ledger = engine.attach_ledger()
+    engine.run(20000)
+    assert len(ledger.rows()) > 0
+
+    engine.order_manager.clear_orders()
+    assert ledger.rows() == []
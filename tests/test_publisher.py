@@ -0,0 +1,79 @@
+import uuid
+
+import pytest
+
+from engine import SimulationEngine
+from publisher import StatePublisher, StateReader
+
+
+@pytest.fixture
+def engine():
+    engine = SimulationEngine(seed=1)
+    engine.run(5000)
+    return engine
+
+
+def test_round_trip(engine):
+    om = engine.order_manager
+    publisher = StatePublisher(f"test-{uuid.uuid4().hex[:12]}", tail=100, unlink=True)
+    reader = StateReader(publisher.name)
+    try:
+        assert reader.read() is None
+        publisher.publish(om, engine.tick)
+        state = reader.read()
+        assert state.tick == engine.tick
+        assert state.price == om.current_price
+        assert state.balance == om.balance
+        assert state.free_margin == om.free_margin
+        assert state.prices.tolist() == om.price_history[-100:]
+        resting = [order for order in om.orders if not order.executed]
+        assert len(state.buy_orders()) + len(state.sell_orders()) == len(resting)
+        assert sorted(order.price for order in state.buy_orders()) == sorted(
+            order.price for order in resting if order.order_type == "buy"
+        )
+        positions = state.open_positions()
+        assert len(positions) == len(om.positions)
+        for published, position in zip(positions, om.positions):
+            assert (published.order_type, published.entry_price, published.volume) == (
+                position.order_type,
+                position.entry_price,
+                position.volume,
+            )
+        assert not state.finished
+    finally:
+        reader.close()
+        publisher.close()
+
+
+def test_zero_copy_state_invalidated_after_two_publishes(engine):
+    om = engine.order_manager
+    publisher = StatePublisher(f"test-{uuid.uuid4().hex[:12]}", tail=100, unlink=True)
+    reader = StateReader(publisher.name)
+    try:
+        publisher.publish(om, engine.tick)
+        state = reader.read(copy=False)
+        assert reader.is_valid(state)
+        tick = state.tick
+        for _ in range(2):
+            engine.run(10)
+            publisher.publish(om, engine.tick)
+        # Вторая публикация перезаписала слот, на который смотрят представления
+        assert not reader.is_valid(state)
+        assert state.tick == tick
+        assert reader.read().tick == engine.tick
+    finally:
+        reader.close()
+        publisher.close()
+
+
+def test_segment_outlives_close_until_reader_unlinks(engine):
+    publisher = StatePublisher(f"test-{uuid.uuid4().hex[:12]}", tail=100)
+    publisher.publish(engine.order_manager, engine.tick)
+    publisher.close()
+
+    reader = StateReader(publisher.name)
+    assert reader.finished
+    assert reader.read().tick == engine.tick
+    reader.close(unlink=True)
+    with pytest.raises(FileNotFoundError):
+        StateReader(publisher.name)
@@ -0,0 +1,80 @@
+import os
+import time
+
+import numpy as np
+
+import risk
+from engine import SimulationEngine
+
+
+def failing_projection(snapshot, num_paths, horizon, seed):
+    raise ValueError("projection failed")
+
+
+def crashing_projection(snapshot, num_paths, horizon, seed):
+    os._exit(1)
+
+
+def wait_for(worker, om, tick, timeout=60.0):
+    deadline = time.monotonic() + timeout
+    while worker.pending is not None and time.monotonic() < deadline:
+        if worker.pending.done():
+            return worker.update(om, tick)
+        time.sleep(0.01)
+    raise AssertionError("risk projection did not finish")
+
+
+def run_engine(ticks=3000):
+    engine = SimulationEngine(seed=1)
+    engine.run(ticks)
+    return engine
+
+
+def test_snapshot_is_compact_arrays():
+    om = run_engine().order_manager
+    snapshot = risk.take_risk_snapshot(om, 0.001)
+    assert snapshot["positions"].shape == (len(om.positions), 3)
+    resting = [order for order in om.orders if not order.executed]
+    assert snapshot["orders"].shape == (len(resting), 3)
+    assert snapshot["orders"][:, 1].tolist() == [order.price for order in resting]
+    result = risk.simulate_forward_risk(snapshot, num_paths=64, horizon=50, seed=1)
+    assert 0.0 <= result["margin_exhaustion_probability"] <= 1.0
+
+
+def test_empty_snapshot():
+    engine = SimulationEngine(seed=1)
+    engine.step(engine.initial_price)
+    om = engine.order_manager
+    om.orders, om.positions = [], []
+    snapshot = risk.take_risk_snapshot(om, 0.001)
+    assert snapshot["positions"].shape == (0, 3) and snapshot["orders"].shape == (0, 3)
+    result = risk.simulate_forward_risk(snapshot, num_paths=16, horizon=10, seed=1)
+    assert np.allclose(result["equity_bands"][50], om.balance)
+
+
+def check_failure_is_isolated(monkeypatch, projection):
+    om = run_engine().order_manager
+    worker = risk.RiskWorker(interval=100, num_paths=16, horizon=10, seed=1)
+    try:
+        monkeypatch.setattr(risk, "simulate_forward_risk", projection)
+        worker.update(om, 1)
+        assert wait_for(worker, om, 2) is None
+        assert worker.failures == 1
+        assert worker.executor is None
+
+        # Следующий расчет идет в новом пуле
+        monkeypatch.undo()
+        worker.update(om, 101)
+        result = wait_for(worker, om, 102)
+        assert result is not None and result["tick"] == 101
+        assert worker.latest is result
+    finally:
+        worker.shutdown()
+
+
+def test_worker_error_is_logged_and_dropped(monkeypatch):
+    check_failure_is_isolated(monkeypatch, failing_projection)
+
+
+def test_broken_process_pool_is_recreated(monkeypatch):
+    check_failure_is_isolated(monkeypatch, crashing_projection)
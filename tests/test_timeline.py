@@ -0,0 +1,88 @@
+import pytest
+
+from engine import SimulationEngine
+from journal import encode_event
+from timeline import TimelineState
+
+
+def live_book(om):
+    orders = {
+        order.id: (order.order_type, order.price, order.volume)
+        for order in om.orders
+        if not order.executed
+    }
+    positions = {
+        position.id: (position.order_type, position.entry_price, position.volume)
+        for position in om.positions
+    }
+    return orders, positions, om.profit
+
+
+def test_state_at_matches_live_book_across_keyframes():
+    engine = SimulationEngine(seed=1)
+    timeline = engine.attach_timeline(keyframe_interval=500)
+    samples = {}
+    for price in engine.generate_prices(6000):
+        engine.step(price)
+        # Тики по обе стороны границ кадров и между ними
+        if engine.tick % 500 in (0, 1, 137, 499):
+            samples[engine.tick] = live_book(engine.order_manager)
+
+    assert len(timeline.keyframe_ticks) > 5
+    assert engine.order_manager.profit != 0
+    for tick, (orders, positions, profit) in samples.items():
+        state = timeline.state_at(tick)
+        assert state.orders == orders, tick
+        assert state.positions == positions, tick
+        assert state.realized_profit == pytest.approx(profit, abs=1e-9), tick
+
+
+def test_snapshot_matches_live_panels():
+    engine = SimulationEngine(seed=1)
+    timeline = engine.attach_timeline(keyframe_interval=500)
+    om = engine.order_manager
+    samples = {}
+    for price in engine.generate_prices(6000):
+        engine.step(price)
+        if engine.tick % 700 == 350:
+            samples[engine.tick] = (
+                price,
+                [(p.id, p.entry_price, p.profit, p.commission) for p in om.closed_positions],
+                [(p.id, p.floating_profit, p.commission) for p in om.positions],
+                [(o.id, o.execution_time, o.execution_price) for o in om.order_history],
+                om.floating_profit,
+            )
+
+    assert any(closed for _, closed, _, _, _ in samples.values())
+    for tick, (price, closed, open_positions, history, floating) in samples.items():
+        snapshot = timeline.snapshot(tick, price, start=tick - 1000)
+        assert [
+            (p.id, p.entry_price, p.profit, p.commission) for p in snapshot["closed_positions"]
+        ] == pytest.approx(closed)
+        assert sorted(
+            (p.id, p.floating_profit, p.commission) for p in snapshot["open_positions"]
+        ) == pytest.approx(sorted(open_positions))
+        assert snapshot["floating_profit"] == pytest.approx(floating)
+        assert [
+            (o.id, o.execution_time, o.execution_price) for o in snapshot["executions"]
+        ] == [item for item in history if tick - 1000 <= item[1] <= tick]
+
+
+def test_apply_ignores_unknown_order_ids():
+    state = TimelineState()
+    state.apply(*encode_event("order_placed", {"id": 1, "side": "buy", "price": 100.0, "volume": 0.5}))
+    state.apply(*encode_event("order_moved", {"id": 2, "price": 99.0}))
+    state.apply(*encode_event("order_moved", {"id": 1, "price": 101.0}))
+    assert state.orders == {1: ("buy", 101.0, 0.5)}
+
+
+def test_timeline_attached_mid_run_ignores_unknown_orders():
+    engine = SimulationEngine(seed=1)
+    engine.run_prices(engine.generate_prices(3000))
+    timeline = engine.attach_timeline(keyframe_interval=500)
+    engine.run_prices(engine.generate_prices(3000))
+
+    assert len(timeline) > 0
+    state = timeline.state_at(engine.tick)
+    live_orders = {order.id for order in engine.order_manager.orders if not order.executed}
+    assert set(state.orders) <= live_orders
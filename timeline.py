@@ -0,0 +1,225 @@
+from bisect import bisect_right
+from types import SimpleNamespace
+
+import numpy as np
+
+from journal import EVENT_CODES, RECORD_DTYPE, SIDE_NAMES, encode_event
+
+
+ORDER_PLACED = EVENT_CODES["order_placed"]
+ORDER_MOVED = EVENT_CODES["order_moved"]
+ORDER_CANCELLED = EVENT_CODES["order_cancelled"]
+ORDER_FILLED = EVENT_CODES["order_filled"]
+POSITION_OPENED = EVENT_CODES["position_opened"]
+POSITION_CLOSED = EVENT_CODES["position_closed"]
+ORDERS_CLEARED = EVENT_CODES["orders_cleared"]
+
+
+class TimelineState:
+    # Состояние книги на момент времени: стоящие ордера, открытые позиции, реализованный P&L
+    __slots__ = ("orders", "positions", "realized_profit")
+
+    def __init__(self, orders=None, positions=None, realized_profit=0.0):
+        self.orders = orders if orders is not None else {}  # id -> (side, price, volume)
+        self.positions = positions if positions is not None else {}  # id -> (side, entry, volume)
+        self.realized_profit = realized_profit
+
+    def copy(self):
+        return TimelineState(dict(self.orders), dict(self.positions), self.realized_profit)
+
+    def apply(self, kind, side, event_id, a, b):
+        # Событие в кодировке журнала (см. journal.encode_event)
+        if kind == ORDER_PLACED:
+            self.orders[event_id] = (SIDE_NAMES[side], a, b)
+        elif kind == ORDER_MOVED:
+            # Ордер мог появиться до подключения таймлайна - такие события пропускаются
+            order = self.orders.get(event_id)
+            if order is not None:
+                self.orders[event_id] = (order[0], a, order[2])
+        elif kind == ORDER_CANCELLED or kind == ORDER_FILLED:
+            self.orders.pop(event_id, None)
+        elif kind == POSITION_OPENED:
+            self.positions[event_id] = (SIDE_NAMES[side], a, b)
+        elif kind == POSITION_CLOSED:
+            self.positions.pop(event_id, None)
+            self.realized_profit += b
+        elif kind == ORDERS_CLEARED:
+            self.orders.clear()
+            self.realized_profit = 0.0
+
+
+class Timeline:
+    # Периодические ключевые кадры + компактный журнал изменений между ними.
+    # Журнал - заранее выделенный структурированный массив в формате journal.RECORD_DTYPE,
+    # при заполнении емкость удваивается.
+    # Подключается как слушатель событий OrderManager (event_listeners).
+    # Состояние на любой тик: бинарный поиск кадра O(log n) + проигрывание дельты.
+    def __init__(self, keyframe_interval=10000, initial_balance=0.0, commission_rate=0.0, capacity=65536):
+        self.keyframe_interval = keyframe_interval
+        self.initial_balance = initial_balance
+        self.commission_rate = commission_rate
+        self.capacity = capacity
+        self.keyframe_ticks = [0]
+        self.keyframe_states = [TimelineState()]
+        self.keyframe_event_index = [0]
+        self.records = np.zeros(capacity, dtype=RECORD_DTYPE)
+        self.count = 0
+        self.state = TimelineState()
+        self.next_keyframe_tick = keyframe_interval
+
+    def __call__(self, tick, kind, fields):
+        if tick >= self.next_keyframe_tick:
+            # Кадр хранит состояние после всех событий до начала этого тика
+            self.keyframe_ticks.append(tick)
+            self.keyframe_states.append(self.state.copy())
+            self.keyframe_event_index.append(self.count)
+            self.next_keyframe_tick = tick + self.keyframe_interval
+        if self.count == len(self.records):
+            records = np.zeros(2 * len(self.records), dtype=RECORD_DTYPE)
+            records[: self.count] = self.records
+            self.records = records
+        event = encode_event(kind, fields)
+        self.records[self.count] = (self.count, tick) + event
+        self.count += 1
+        self.state.apply(*event)
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def events(self):
+        return self.records[: self.count]
+
+    def _end_index(self, tick):
+        return int(np.searchsorted(self.records["tick"][: self.count], tick, side="right"))
+
+    def state_at(self, tick):
+        # Состояние после всех событий с номером тика <= tick
+        index = bisect_right(self.keyframe_ticks, tick) - 1
+        if index < 0:
+            return TimelineState()
+        state = self.keyframe_states[index].copy()
+        delta = self.records[self.keyframe_event_index[index] : self._end_index(tick)]
+        for event in zip(
+            delta["kind"].tolist(),
+            delta["side"].tolist(),
+            delta["id"].tolist(),
+            delta["a"].tolist(),
+            delta["b"].tolist(),
+        ):
+            state.apply(*event)
+        return state
+
+    def closed_positions_at(self, tick):
+        # Закрытые к тику позиции: закрытия сопоставляются с открытиями по id векторно
+        events = self.records[: self._end_index(tick)]
+        opened = events[events["kind"] == POSITION_OPENED]
+        closed = events[events["kind"] == POSITION_CLOSED]
+        order = np.argsort(opened["id"], kind="stable")
+        opened = opened[order]
+        index = np.minimum(np.searchsorted(opened["id"], closed["id"]), max(len(opened) - 1, 0))
+        if len(opened):
+            known = opened["id"][index] == closed["id"]
+            closed, entries = closed[known], opened[index[known]]
+        else:
+            closed, entries = closed[:0], opened
+        commission = entries["a"] * entries["b"] * self.commission_rate
+        return [
+            SimpleNamespace(
+                id=position_id,
+                order_type=SIDE_NAMES[side],
+                entry_price=entry_price,
+                exit_price=exit_price,
+                volume=volume,
+                profit=profit,
+                commission=position_commission,
+            )
+            for position_id, side, entry_price, exit_price, volume, profit, position_commission in zip(
+                closed["id"].tolist(),
+                entries["side"].tolist(),
+                entries["a"].tolist(),
+                closed["a"].tolist(),
+                entries["b"].tolist(),
+                closed["b"].tolist(),
+                commission.tolist(),
+            )
+        ]
+
+    def executions_between(self, start, end):
+        # Исполнения с тиком в [start, end] - в формате Order для update_order_history
+        first = int(np.searchsorted(self.records["tick"][: self.count], start, side="left"))
+        events = self.records[first : self._end_index(end)]
+        fills = events[events["kind"] == ORDER_FILLED]
+        return [
+            SimpleNamespace(
+                id=order_id,
+                order_type=SIDE_NAMES[side],
+                executed=True,
+                execution_time=tick,
+                execution_price=price,
+                price=price,
+                volume=volume,
+            )
+            for order_id, side, tick, price, volume in zip(
+                fills["id"].tolist(),
+                fills["side"].tolist(),
+                fills["tick"].tolist(),
+                fills["a"].tolist(),
+                fills["b"].tolist(),
+            )
+        ]
+
+    def snapshot(self, tick, price, start=None):
+        state = self.state_at(tick)
+        open_positions = []
+        for position_id, (side, entry, volume) in state.positions.items():
+            floating = (price - entry) * volume if side == "buy" else (entry - price) * volume
+            open_positions.append(
+                SimpleNamespace(
+                    id=position_id,
+                    order_type=side,
+                    entry_price=entry,
+                    volume=volume,
+                    floating_profit=floating,
+                    commission=entry * volume * self.commission_rate,
+                )
+            )
+        closed_positions = self.closed_positions_at(tick)
+        floating = sum(position.floating_profit for position in open_positions)
+        total_commission = sum(position.commission for position in open_positions) + sum(
+            position.commission for position in closed_positions
+        )
+        balance = self.initial_balance + state.realized_profit
+        margin = sum(position.volume for position in open_positions) * price
+        return {
+            "tick": tick,
+            "price": price,
+            "buy_orders": [
+                SimpleNamespace(
+                    id=order_id, order_type=side, price=order_price, volume=volume, commission=0.0, profit=0.0
+                )
+                for order_id, (side, order_price, volume) in state.orders.items()
+                if side == "buy"
+            ],
+            "sell_orders": [
+                SimpleNamespace(
+                    id=order_id, order_type=side, price=order_price, volume=volume, commission=0.0, profit=0.0
+                )
+                for order_id, (side, order_price, volume) in state.orders.items()
+                if side == "sell"
+            ],
+            "positions": state.positions,
+            "open_positions": open_positions,
+            "closed_positions": closed_positions,
+            "executions": self.executions_between(tick if start is None else start, tick),
+            "realized_profit": state.realized_profit,
+            "floating_profit": floating,
+            "total_commission": total_commission,
+            "balance": balance,
+            "margin": margin,
+            "free_margin": balance - margin,
+            "equity": balance + floating,
+        }
+
+    def clear(self):
+        self.__init__(self.keyframe_interval, self.initial_balance, self.commission_rate, self.capacity)